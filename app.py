@@ -1,7 +1,9 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g, has_app_context
 from werkzeug.utils import secure_filename
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_wtf.csrf import CSRFProtect
+from jinja2 import FileSystemBytecodeCache
 from werkzeug.security import generate_password_hash, check_password_hash
 from supabase import create_client
 from datetime import datetime, timedelta, date
@@ -9,17 +11,66 @@ import os
 from os import makedirs
 from os.path import join, exists
 import jwt
-from functools import wraps
+import orjson
+from functools import wraps, lru_cache
+from contextlib import contextmanager
+from itertools import groupby
 from dotenv import load_dotenv
+import calendar
 import csv
+import heapq
+import stat
 import io
+import tempfile
+import threading
+import time
+import re
+from concurrent.futures import ThreadPoolExecutor
 from mailer import send_email
 from email_templates import overdue_tasks_email, weekly_home_checkin, LOGO_URL
 
 # Load environment variables
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; falls back to Flask's encoder for unsupported values."""
+
+    def _option(self):
+        return orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._option()).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # jsonify() body as orjson bytes directly, skipping the str decode/re-encode
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._option() | orjson.OPT_APPEND_NEWLINE
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        try:
+            body = orjson.dumps(obj, default=self.default, option=option)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# Compiled templates persist in the temp dir, so a restarted worker skips recompiling them
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# Constant JSON error bodies, encoded once; each use still gets its own Response
+# since after_request hooks and the session interface mutate response headers.
+_ERR_NOT_AUTHENTICATED = orjson.dumps({'error': 'Not authenticated'}, option=orjson.OPT_APPEND_NEWLINE)
+_ERR_TASK_NOT_FOUND = orjson.dumps({'error': 'Task not found'}, option=orjson.OPT_APPEND_NEWLINE)
+
+def _json_error(body, status):
+    return app.response_class(body, status=status, mimetype=app.json.mimetype)
 
 # Load configuration based on environment
 env = os.getenv('FLASK_ENV', 'development')
@@ -32,6 +83,16 @@ else:
 
 # Secret key verification (now handled in config.py with fallback)
 
+# Largest banner image accepted by /home/photo
+HOME_PHOTO_MAX_BYTES = 8 * 1024 * 1024
+
+@app.before_request
+def _limit_upload_size():
+    # Registered ahead of CSRFProtect, whose token check parses the form: the cap has to
+    # be in place before the multipart body is read so Werkzeug stops at it with a 413
+    if request.endpoint == 'upload_home_photo':
+        request.max_content_length = HOME_PHOTO_MAX_BYTES
+
 # CSRF Protection
 csrf = CSRFProtect(app)
 
@@ -62,6 +123,34 @@ CORS(app, resources={
     }
 })
 
+# Static assets: url_for('static') URLs carry the file's mtime as ?v=, so a
+# versioned response can be cached by browsers for a year (a deploy changes v).
+STATIC_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+@lru_cache(maxsize=256)
+def _static_version(filename):
+    try:
+        return str(int(os.stat(os.path.join(app.static_folder, filename)).st_mtime))
+    except OSError:
+        return None
+
+@app.url_defaults
+def _version_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        v = _static_version(values['filename'])
+        if v:
+            values['v'] = v
+
+@app.after_request
+def _cache_versioned_static(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        # send_file marks static responses no-cache; drop it or browsers still revalidate
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE_SECONDS
+        response.cache_control.immutable = True
+    return response
+
 # --- Minimal routes (root + health) ---
 @app.route('/')
 def index():
@@ -99,7 +188,7 @@ def create_task():
             nd = date.fromisoformat(next_due_raw)
             next_due = nd
         else:
-            next_due = datetime.now().date() + timedelta(days=frequency_days)
+            next_due = _request_today() + timedelta(days=frequency_days)
     except Exception:
         return ('Invalid due date', 400)
     try:
@@ -117,7 +206,8 @@ def create_task():
             payload['priority'] = priority
         
         # Insert task and get the created task ID
-        result = supabase.table('tasks').insert(payload).execute()
+        with _tasks_write(user_id):
+            result = supabase.table('tasks').insert(payload).execute()
         
         # Create history entry for task creation
         if result.data and len(result.data) > 0:
@@ -126,8 +216,7 @@ def create_task():
                 supabase.table('task_history').insert({
                     'task_id': task_id,
                     'user_id': user_id,
-                    'action': 'created',
-                    'created_at': datetime.now().isoformat()
+                    'action': 'created'
                 }).execute()
             except Exception as hist_error:
                 print(f"Warning: Could not create history entry: {hist_error}")
@@ -140,36 +229,50 @@ def create_task():
 @app.route('/delete_task/<int:task_id>', methods=['POST'])
 def delete_task(task_id):
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     user_id = session['user_id']
     try:
-        # Ensure task belongs to user
-        owned = supabase.table('tasks').select('id').eq('id', task_id).eq('user_id', user_id).execute()
-        if not owned.data:
-            return jsonify({'error': 'Task not found'}), 404
-        # Delete task (and optionally history)
+        # Delete task (and optionally history). Both deletes are scoped to the
+        # user, so the returned task row doubles as the ownership check.
         try:
             supabase.table('task_history').delete().eq('task_id', task_id).eq('user_id', user_id).execute()
         except Exception:
             pass
-        supabase.table('tasks').delete().eq('id', task_id).eq('user_id', user_id).execute()
+        with _tasks_write(user_id):
+            res = supabase.table('tasks').delete().eq('id', task_id).eq('user_id', user_id).execute()
+        if not res.data:
+            return _json_error(_ERR_TASK_NOT_FOUND, 404)
         return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _task_history_rows(task_id, user_id):
+    """History entries for one of the user's tasks, newest first."""
+    def query(cols):
+        return (supabase.table('task_history').select(cols)
+                .eq('task_id', task_id).eq('user_id', user_id)
+                .order('created_at', desc=True))
+    try:
+        res = query(HISTORY_COLS).execute()
+    except Exception:
+        # Fallback if the optional delta_days column is not deployed
+        res = query('*').execute()
+    return res.data or []
+
 @app.route('/tasks/<int:task_id>/history')
 def task_history(task_id):
     """Return server-rendered HTML snippet for task history (for modal injection)."""
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     user_id = session['user_id']
     try:
+        # History is scoped to the user, so it can load alongside the ownership check
+        hist_future = _IO_POOL.submit(_task_history_rows, task_id, user_id)
         tres = supabase.table('tasks').select('id,title').eq('id', task_id).eq('user_id', user_id).execute()
         if not tres.data:
-            return jsonify({'error': 'Task not found'}), 404
+            return _json_error(_ERR_TASK_NOT_FOUND, 404)
         task = tres.data[0]
-        hist = supabase.table('task_history').select('*').eq('task_id', task_id).eq('user_id', user_id).order('created_at', desc=True).execute()
-        history = hist.data or []
+        history = hist_future.result()
         html = render_template('partials/history_list.html', task=task, history=history)
         return html
     except Exception as e:
@@ -210,36 +313,42 @@ def edit_task(task_id):
         if priority_raw in PRIORITY_VALUES:
             priority = priority_raw
         else:
-            flash(f"Priority must be one of {sorted(PRIORITY_VALUES)}")
+            flash(_PRIORITY_ERR)
             return redirect(url_for('dashboard'))
     try:
-        # Verify task belongs to user
-        task_res = supabase.table('tasks').select('*').eq('id', task_id).eq('user_id', user_id).execute()
-        if not task_res.data:
-            flash('Task not found!')
-            return redirect(url_for('dashboard'))
-        row = task_res.data[0]
-        payload = {}
-        if 'title' in row: payload['title'] = title
-        if 'description' in row: payload['description'] = description
-        if 'frequency_days' in row: payload['frequency_days'] = frequency_days
-        if 'category' in row and category is not None:
-            payload['category'] = category
-        if next_due_date is not None and 'next_due_date' in row:
-            payload['next_due_date'] = next_due_date
-        if priority is not None and 'priority' in row:
-            payload['priority'] = priority
+        # Writable columns come from the cached tasks schema, so no per-edit read
+        # is needed; the user_id filter on the UPDATE doubles as the ownership check
+        cols = _table_columns('tasks')
+        if cols is None:
+            # Schema unavailable: probe the task row for the columns it has
+            try:
+                task_res = supabase.table('tasks').select(TASK_EDIT_COLS).eq('id', task_id).eq('user_id', user_id).execute()
+            except Exception:
+                # Fallback if an optional column (e.g. category) is not deployed
+                task_res = supabase.table('tasks').select('*').eq('id', task_id).eq('user_id', user_id).execute()
+            if not task_res.data:
+                flash('Task not found!')
+                return redirect(url_for('dashboard'))
+            cols = task_res.data[0].keys()
+        candidate = {'title': title, 'description': description, 'frequency_days': frequency_days}
+        if category is not None: candidate['category'] = category
+        if next_due_date is not None: candidate['next_due_date'] = next_due_date
+        if priority is not None: candidate['priority'] = priority
+        payload = {k: v for k, v in candidate.items() if k in cols}
         
         # Update task
-        supabase.table('tasks').update(payload).eq('id', task_id).eq('user_id', user_id).eq('archived', False).execute()
+        with _tasks_write(user_id):
+            res = supabase.table('tasks').update(payload).eq('id', task_id).eq('user_id', user_id).eq('archived', False).execute()
+        if not res.data:
+            flash('Task not found!')
+            return redirect(url_for('dashboard'))
         
         # Create history entry
         try:
             supabase.table('task_history').insert({
                 'task_id': task_id,
                 'user_id': user_id,
-                'action': 'updated',
-                'created_at': datetime.now().isoformat()
+                'action': 'updated'
             }).execute()
         except Exception as hist_error:
             print(f"Warning: Could not create history entry: {hist_error}")
@@ -274,9 +383,31 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 else:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Public storage URLs are deterministic; format them locally instead of via the SDK
+_PUBLIC_URL_TEMPLATE = f"{(SUPABASE_URL or '').rstrip('/')}/storage/v1/object/public/{{bucket}}/{{path}}"
+
+# Shared pool for issuing independent Supabase reads concurrently (HTTP I/O releases the GIL)
+_IO_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='supabase-io')
+
 # Runtime feature flag: whether the 'tasks.task_key' column exists in the DB.
 # If inserts fail due to schema cache or missing column, we'll disable it and retry without.
 TASK_KEY_SUPPORTED = True
+# Whether TASK_KEY_SUPPORTED has been confirmed against the DB in this process.
+TASK_KEY_PROBED = False
+
+# Rows per seeding INSERT; sized so a full catalog seed is a single statement.
+INSERT_BATCH_SIZE = 200
+# Concurrent PostgREST requests used when seeding inserts several batches.
+INSERT_BATCH_WORKERS = 4
+
+def _request_today():
+    """date.today(), read once per request and shared by the handler and the templates it renders."""
+    if not has_app_context():
+        return date.today()
+    today = g.get('today')
+    if today is None:
+        today = g.today = date.today()
+    return today
 
 # Jinja filter: render due dates as Today / N days ago / YYYY-MM-DD
 @app.template_filter('due_label')
@@ -294,8 +425,8 @@ def due_label(value):
         elif isinstance(value, date):
             d = value
         else:
-            d = datetime.fromisoformat(str(value)).date()
-        today = datetime.now().date()
+            d = date.fromisoformat(str(value)[:10])
+        today = _request_today()
         diff = (today - d).days
         if diff == 0:
             return 'Today'
@@ -443,7 +574,7 @@ FEATURE_KEY_ALIASES = {
 }
 
 # --- Catalog import/validation constants & helpers ---
-ALLOWED_FEATURE_KEYS = {
+ALLOWED_FEATURE_KEYS = frozenset({
     # Core features
     'has_hvac',
     'has_gutters',
@@ -477,9 +608,50 @@ ALLOWED_FEATURE_KEYS = {
     'has_carpet',
     'has_outdoor',
     'has_deck',
-}
-
-PRIORITY_VALUES = {'low', 'medium', 'high'}
+})
+# Stable iteration order for per-request feature-flag projections
+_ALLOWED_FEATURE_KEYS_T = tuple(sorted(ALLOWED_FEATURE_KEYS))
+
+PRIORITY_VALUES = frozenset({'low', 'medium', 'high'})
+_PRIORITY_ERR = f"Priority must be one of {sorted(PRIORITY_VALUES)}"
+
+# Account form validation (register / forgot / reset password)
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_UPPER_RE = re.compile(r'[A-Z]')
+_LOWER_RE = re.compile(r'[a-z]')
+_DIGIT_RE = re.compile(r'[0-9]')
+
+# Characters that cannot be passed literally inside a quoted PostgREST or=() value
+# (quote/escape characters and LIKE wildcards); searches containing them are
+# filtered in Python instead. Commas and parentheses are safe once quoted.
+_SEARCH_RESERVED_CHARS = frozenset('"\\*%_')
+
+# Explicit column lists for hot reads (avoid select('*') payloads).
+# Task columns rendered by dashboard cards and the edit modal.
+TASK_LIST_COLS = ('id,title,description,frequency_days,category,priority,next_due_date,'
+                  'next_due_ordinal,is_completed,last_completed,seasonal,season_code,archived')
+# Columns edit_task may write; fetched to check ownership and which ones exist.
+TASK_EDIT_COLS = 'id,title,description,frequency_days,category,next_due_date,priority'
+# task_history fields rendered by partials/history_list.html.
+HISTORY_COLS = 'action,created_at,delta_days'
+# users fields login needs to verify the password and start the session.
+LOGIN_USER_COLS = 'id,username,password_hash'
+# Task fields rendered by the digest/overdue emails (email_templates.py).
+DIGEST_TASK_COLS = 'id,title,description,next_due_date,priority'
+# home_features columns written by the questionnaire, home basics and baseline flows.
+# Only list columns created in supabase_migrations.sql: unknown columns fail the whole query.
+HOME_FEATURE_COLS = ','.join((
+    'user_id', 'home_type', 'year_built', 'home_size', 'has_yard', 'carpet',
+    'has_hvac', 'has_window_units', 'has_radiator_boiler', 'no_central_hvac',
+    'has_water_heater', 'has_water_softener', 'has_well', 'has_septic', 'has_sump_pump',
+    'fireplace_type', 'has_fireplace', 'has_dishwasher', 'has_garbage_disposal',
+    'has_washer_dryer', 'has_refrigerator_ice', 'has_range_hood', 'has_gutters',
+    'garage_type', 'has_garage', 'has_deck_patio', 'has_pool_hot_tub', 'freezes',
+    'season_spring', 'season_summer', 'season_autumn', 'season_winter',
+    'has_pets', 'pet_dog', 'pet_cat', 'pet_other', 'travel_often',
+    'address', 'square_feet', 'beds', 'baths', 'banner_url',
+    'baseline_checkup_dismissed', 'baseline_last_checked',
+))
 
 # Default meteorological season starts (Northern hemisphere). Future: user-defined seasons.
 DEFAULT_SEASON_STARTS = {
@@ -507,43 +679,52 @@ RAMP_SETTINGS = {
     'stagger_weeks': 12,  # Increased from 8 - slower rollout
 }
 
+# Lookup table for _parse_bool. True/False keys also match the ints 1/0.
+_BOOL_MAP = {
+    True: True, False: False,
+    'true': True, '1': True, 'yes': True, 'y': True,
+    'false': False, '0': False, 'no': False, 'n': False,
+}
+
 def _parse_bool(val, default=None):
     if val is None:
         return default
-    s = str(val).strip().lower()
-    if s in ('true', '1', 'yes', 'y'):
-        return True
-    if s in ('false', '0', 'no', 'n'):
-        return False
-    return default
+    if not isinstance(val, (bool, int)):
+        val = (val if isinstance(val, str) else str(val)).strip().lower()
+    return _BOOL_MAP.get(val, default)
 
 def _parse_int(val, default=None):
+    if type(val) is int:
+        return val
+    if val is None:
+        return default
     try:
-        if val is None or str(val).strip() == '':
-            return default
-        return int(str(val).strip())
+        # int() tolerates surrounding whitespace and rejects blank strings
+        return int(val if isinstance(val, str) else str(val))
     except Exception:
         return default
 
+# One "key = value" segment of feature_requirements, already stripped.
+# Groups: key, '=' (empty when missing), value.
+_REQ_RE = re.compile(r'\s*([^;=]*?)\s*(?:(=)\s*([^;]*?))?\s*(?:;|$)')
+
 def _parse_feature_requirements(s):
     """Parse semicolon-separated key=value into dict with boolean values.
     Returns (req_dict, errors)
     """
     req = {}
     errors = []
-    if not s or str(s).strip() == '':
+    if not s:
         return req, errors
-    parts = [p.strip() for p in str(s).split(';') if p.strip()]
-    for part in parts:
-        if '=' not in part:
-            errors.append(f"invalid requirement '{part}' (expected key=value)")
+    for key, eq, value in _REQ_RE.findall(str(s)):
+        if not eq:
+            # Blank segments (e.g. trailing ';') produce an empty key
+            if key:
+                errors.append(f"invalid requirement '{key}' (expected key=value)")
             continue
-        key, value = part.split('=', 1)
-        key = key.strip()
         # Map alias if present
         if key in FEATURE_KEY_ALIASES:
             key = FEATURE_KEY_ALIASES[key]
-        value = value.strip()
         if key not in ALLOWED_FEATURE_KEYS:
             # Ignore unknown keys gracefully instead of dropping the row
             # (keeps catalog resilient to minor naming differences)
@@ -555,6 +736,28 @@ def _parse_feature_requirements(s):
         req[key] = b
     return req, errors
 
+_MONTH_MAP = {
+    'january': '01', 'february': '02', 'march': '03', 'april': '04',
+    'may': '05', 'june': '06', 'july': '07', 'august': '08',
+    'september': '09', 'october': '10', 'november': '11', 'december': '12',
+}
+
+def _season_start(val):
+    """Normalize a questionnaire season month ('03', 'march', ISO date) to '2024-MM-01'."""
+    if not val:
+        return None
+    s = str(val).strip()
+    # The form posts two-digit month codes; check those before anything costlier
+    if len(s) == 2 and s.isdigit():
+        return f"2024-{s}-01"
+    mm = _MONTH_MAP.get(s.lower())
+    if mm:
+        return f"2024-{mm}-01"
+    try:
+        return f"2024-{date.fromisoformat(s[:10]).month:02d}-01"
+    except ValueError:
+        return f"2024-{s}-01"
+
 def _valid_month_day(month, day):
     try:
         # Use leap year to allow Feb 29 in validation
@@ -563,19 +766,196 @@ def _valid_month_day(month, day):
     except Exception:
         return False
 
-def reactivate_due_tasks(user_id):
+# Hash checked when no stored hash exists, so failed logins cost the same
+# KDF time whether or not the account exists.
+_DUMMY_PASSWORD_HASH = generate_password_hash('keeply-timing-equalizer')
+
+# Bounded pool for password KDF work so concurrent auth requests cannot
+# saturate every core, and cooperative workers are not pinned by the hash.
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix='pwhash')
+
+def _hash_password(password):
+    return _HASH_POOL.submit(generate_password_hash, password).result()
+
+def _verify_password(stored_hash, password):
+    """check_password_hash that still runs the KDF when stored_hash is missing."""
+    if not stored_hash:
+        _HASH_POOL.submit(check_password_hash, _DUMMY_PASSWORD_HASH, password or '').result()
+        return False
+    return _HASH_POOL.submit(check_password_hash, stored_hash, password or '').result()
+
+def _upsert_home_features(user_id, payload):
+    """Insert or update the user's home_features row in a single request."""
+    row = dict(payload)
+    row['user_id'] = user_id
+    return supabase.table('home_features').upsert(row, on_conflict='user_id').execute()
+
+def _save_questionnaire(user_id, features, user_updates):
+    """Save users persona/budget and home_features in one save_questionnaire RPC.
+    Falls back to separate requests if the function is not deployed.
+    """
+    try:
+        supabase.rpc('save_questionnaire', {
+            'p_user_id': user_id,
+            'p_features': features,
+            'p_user_updates': user_updates or {},
+        }).execute()
+        return
+    except Exception as e:
+        print(f"save_questionnaire RPC unavailable, using separate writes: {e}")
+    if user_updates:
+        try:
+            supabase.table('users').update(user_updates).eq('id', user_id).execute()
+        except Exception:
+            # Non-fatal: ignore if columns do not exist yet
+            pass
+    _upsert_home_features(user_id, features)
+
+# table -> column names, kept for the life of the process once read. A failed
+# lookup is not kept; it is retried after TABLE_COLUMNS_RETRY_SECONDS.
+TABLE_COLUMNS_RETRY_SECONDS = 60
+_TABLE_COLUMNS = {}
+_TABLE_COLUMNS_RETRY_AT = {}
+
+def _table_columns(table):
+    """Column names of a public table, fetched once per process (None if unavailable)."""
+    cols = _TABLE_COLUMNS.get(table)
+    if cols is not None or _TABLE_COLUMNS_RETRY_AT.get(table, 0) > time.monotonic():
+        return cols
+    try:
+        res = supabase.rpc('table_columns', {'p_table': table}).execute()
+        # SETOF text comes back as a list of bare strings
+        cols = frozenset(c if isinstance(c, str) else next(iter(c.values())) for c in (res.data or []))
+        if cols:
+            _TABLE_COLUMNS[table] = cols
+            return cols
+    except Exception as e:
+        print(f"Could not read columns for {table}: {e}")
+    _TABLE_COLUMNS_RETRY_AT[table] = time.monotonic() + TABLE_COLUMNS_RETRY_SECONDS
+    return None
+
+def _home_feature_select():
+    """HOME_FEATURE_COLS narrowed to the columns that exist in this deployment."""
+    existing = _table_columns('home_features')
+    if not existing:
+        return HOME_FEATURE_COLS
+    return ','.join(c for c in HOME_FEATURE_COLS.split(',') if c in existing)
+
+def _safe_date(value):
+    """Date from the 'YYYY-MM-DD' prefix of a date/timestamp string (None if missing or invalid)."""
+    if not value or len(value) < 10:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+def _due_ordinal(task):
+    """Day ordinal of a task's next_due_date (None if missing or invalid).
+    Uses the trigger-maintained next_due_ordinal column when it was selected.
+    """
+    o = task.get('next_due_ordinal')
+    if o is not None:
+        return o
+    d = _safe_date(task.get('next_due_date'))
+    return d.toordinal() if d else None
+
+# Short-lived per-process cache of each user's non-archived task rows (dashboard).
+# Every tasks write for a user runs inside _tasks_write, which drops the entry
+# once the write has finished. Invalidation only reaches this process, so the cache
+# is coherent only because render.yaml runs a single gunicorn worker (threads share
+# it); with several workers a write in one could leave another serving stale rows
+# for up to USER_TASKS_TTL_SECONDS.
+USER_TASKS_TTL_SECONDS = 20
+USER_TASKS_MAXSIZE = 1024
+_USER_TASKS_CACHE = {}
+# Bumped by every invalidation; a read that overlapped one doesn't store its rows
+_USER_TASKS_GEN = [0]
+# Guards the generation check + store, invalidation, and _REACTIVATING membership
+_USER_TASKS_LOCK = threading.Lock()
+
+def _user_tasks(user_id):
+    """Non-archived task rows for the dashboard, served from a 20s cache.
+    The row dicts are shared with the cache: copy a row before changing it.
+    """
+    hit = _USER_TASKS_CACHE.get(user_id)
+    if hit is None or hit[0] <= time.monotonic():
+        gen = _USER_TASKS_GEN[0]
+        try:
+            rows = (supabase.table('tasks')
+                    .select(TASK_LIST_COLS)
+                    .eq('user_id', user_id)
+                    .eq('archived', False)
+                    .order('next_due_date')
+                    .execute()).data or []
+        except Exception:
+            # Fallback if an optional column in TASK_LIST_COLS (or 'archived') is not
+            # deployed; archived rows are filtered here since the column may be missing
+            rows = (supabase.table('tasks')
+                    .select('*')
+                    .eq('user_id', user_id)
+                    .order('next_due_date')
+                    .execute()).data or []
+            rows = [r for r in rows if not r.get('archived')]
+        now = time.monotonic()
+        hit = (now + USER_TASKS_TTL_SECONDS, rows)
+        with _USER_TASKS_LOCK:
+            if gen == _USER_TASKS_GEN[0]:
+                if len(_USER_TASKS_CACHE) >= USER_TASKS_MAXSIZE:
+                    _evict_user_tasks(now)
+                _USER_TASKS_CACHE[user_id] = hit
+    return list(hit[1])
+
+def _evict_user_tasks(now):
+    """Drop expired entries, then the oldest ones until there is room for one more.
+    Caller holds _USER_TASKS_LOCK.
+    """
+    for uid, (expires, _rows) in list(_USER_TASKS_CACHE.items()):
+        if expires <= now:
+            _USER_TASKS_CACHE.pop(uid, None)
+    excess = len(_USER_TASKS_CACHE) - USER_TASKS_MAXSIZE + 1
+    for uid in list(_USER_TASKS_CACHE)[:max(excess, 0)]:
+        _USER_TASKS_CACHE.pop(uid, None)
+
+def _invalidate_user_tasks(user_id):
+    with _USER_TASKS_LOCK:
+        _USER_TASKS_GEN[0] += 1
+        _USER_TASKS_CACHE.pop(user_id, None)
+
+@contextmanager
+def _tasks_write(user_id):
+    """Wrap a write to the user's tasks; their cached rows are dropped once it finishes or fails."""
+    try:
+        yield
+    finally:
+        _invalidate_user_tasks(user_id)
+
+# Users with a background reactivation in flight; repeat dashboard hits skip resubmitting.
+# Membership is tested and set under _USER_TASKS_LOCK.
+_REACTIVATING = set()
+
+def reactivate_due_tasks(user_id, today=None):
     """Mark tasks as active again if their next_due_date is now in the past (while keeping archived)."""
-    today = datetime.now().date().isoformat()
+    today = (today or date.today()).isoformat()
     try:
         supabase.table('tasks').update({
             'is_completed': False
         }).eq('user_id', user_id).eq('is_completed', True).eq('archived', False).lte('next_due_date', today).execute()
     except Exception as e:
         print(f"Error reactivating tasks: {e}")
+    finally:
+        # May run in the background; drop rows cached before the write landed
+        _invalidate_user_tasks(user_id)
+        with _USER_TASKS_LOCK:
+            _REACTIVATING.discard(user_id)
 
 # -------------------------
 # Auth routes
 # -------------------------
+def _is_unique_violation(exc):
+    """True if a PostgREST error is a Postgres unique violation (SQLSTATE 23505)."""
+    return getattr(exc, 'code', None) == '23505' or 'duplicate key' in str(exc)
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -589,9 +969,7 @@ def register():
             return render_template('register.html')
         
         # Email validation
-        import re
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
+        if not _EMAIL_RE.match(email):
             flash('Please enter a valid email address (e.g., user@example.com)')
             return render_template('register.html')
         
@@ -600,29 +978,32 @@ def register():
             flash('Password must be at least 8 characters long')
             return render_template('register.html')
         
-        if not re.search(r'[A-Z]', password):
+        if not _UPPER_RE.search(password):
             flash('Password must contain at least one uppercase letter')
             return render_template('register.html')
         
-        if not re.search(r'[a-z]', password):
+        if not _LOWER_RE.search(password):
             flash('Password must contain at least one lowercase letter')
             return render_template('register.html')
         
-        if not re.search(r'[0-9]', password):
+        if not _DIGIT_RE.search(password):
             flash('Password must contain at least one number')
             return render_template('register.html')
         
         try:
-            existing = supabase.table('users').select('id').eq('email', email).execute()
-            if existing.data:
-                flash('Email already exists!')
-                return render_template('register.html')
-            password_hash = generate_password_hash(password)
-            res = supabase.table('users').insert({
-                'username': name,
-                'email': email,
-                'password_hash': password_hash
-            }).execute()
+            password_hash = _hash_password(password)
+            # Single INSERT; the unique constraint on users.email rejects duplicates
+            try:
+                res = supabase.table('users').insert({
+                    'username': name,
+                    'email': email,
+                    'password_hash': password_hash
+                }).execute()
+            except Exception as e:
+                if _is_unique_violation(e):
+                    flash('Email already exists!')
+                    return render_template('register.html')
+                raise
             if res.data:
                 user = res.data[0]
                 session.permanent = True  # Enable session lifetime
@@ -641,8 +1022,9 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         try:
-            res = supabase.table('users').select('*').eq('email', email).execute()
-            if res.data and check_password_hash(res.data[0]['password_hash'], password):
+            res = supabase.table('users').select(LOGIN_USER_COLS).eq('email', email).execute()
+            stored_hash = res.data[0].get('password_hash') if res.data else None
+            if _verify_password(stored_hash, password):
                 user = res.data[0]
                 session.permanent = True  # Enable session lifetime
                 session['user_id'] = user['id']
@@ -668,9 +1050,7 @@ def forgot_password():
             return render_template('forgot_password.html')
         
         # Email validation
-        import re
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
+        if not _EMAIL_RE.match(email):
             flash('Please enter a valid email address')
             return render_template('forgot_password.html')
         
@@ -787,26 +1167,25 @@ def reset_password(token):
             return render_template('reset_password.html', token=token)
         
         # Password validation
-        import re
         if len(password) < 8:
             flash('Password must be at least 8 characters long')
             return render_template('reset_password.html', token=token)
         
-        if not re.search(r'[A-Z]', password):
+        if not _UPPER_RE.search(password):
             flash('Password must contain at least one uppercase letter')
             return render_template('reset_password.html', token=token)
         
-        if not re.search(r'[a-z]', password):
+        if not _LOWER_RE.search(password):
             flash('Password must contain at least one lowercase letter')
             return render_template('reset_password.html', token=token)
         
-        if not re.search(r'[0-9]', password):
+        if not _DIGIT_RE.search(password):
             flash('Password must contain at least one number')
             return render_template('reset_password.html', token=token)
         
         try:
             # Update password
-            password_hash = generate_password_hash(password)
+            password_hash = _hash_password(password)
             supabase.table('users').update({'password_hash': password_hash}).eq('id', user_id).execute()
             
             flash('Password successfully reset! You can now login with your new password.')
@@ -829,74 +1208,65 @@ def dashboard():
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        reactivate_due_tasks(user_id)
-        try:
-            tasks_res = (supabase.table('tasks')
-                         .select('*')
-                         .eq('user_id', user_id)
-                         .eq('is_completed', False)
-                         .eq('archived', False)
-                         .order('next_due_date')
-                         .execute())
-            tasks = tasks_res.data or []
-        except Exception:
-            # Fallback if 'archived' column does not exist
-            tasks_res = (supabase.table('tasks')
-                         .select('*')
-                         .eq('user_id', user_id)
-                         .eq('is_completed', False)
-                         .order('next_due_date')
-                         .execute())
-            tasks = tasks_res.data or []
-        today = datetime.now().date()
-        next_month = today + timedelta(days=30)
+        today = _request_today()
+        today_iso = today.isoformat()
+        # Active and completed tasks in one (cached) round-trip; partitioned below
+        rows = _user_tasks(user_id)
+        # Completed tasks that have come due again; only write when there are any
+        due_again = [t for t in rows
+                     if t.get('is_completed') and '' < (t.get('next_due_date') or '')[:10] <= today_iso]
+        if due_again:
+            # The page renders from the locally patched rows, so the write
+            # doesn't need to finish first; run it alongside the render
+            with _USER_TASKS_LOCK:
+                submit = user_id not in _REACTIVATING
+                if submit:
+                    _REACTIVATING.add(user_id)
+            if submit:
+                _IO_POOL.submit(reactivate_due_tasks, user_id, today)
+            # Patch copies of just those rows; the cached rows stay untouched
+            reactivated = {id(t) for t in due_again}
+            rows = [dict(t, is_completed=False) if id(t) in reactivated else t for t in rows]
+        tasks = [t for t in rows if not t.get('is_completed')]
+        # Recently completed: the 10 latest by last_completed, nulls first like
+        # Postgres ORDER BY ... DESC; nlargest avoids sorting every completed row
+        completed = heapq.nlargest(10, (t for t in rows if t.get('is_completed')),
+                                   key=lambda t: (t.get('last_completed') is None, t.get('last_completed') or ''))
+        today_ord = today.toordinal()
         overdue = []
         upcoming = []
         future = []
+        due_7 = 0
+        # Single pass: bucket by integer day delta
         for t in tasks:
-            nd = t.get('next_due_date')
-            if not nd:
+            due_ord = _due_ordinal(t)
+            if due_ord is None:
                 future.append(t)
                 continue
-            try:
-                d = datetime.fromisoformat(nd).date()
-            except Exception:
-                future.append(t); continue
-            if d < today:
+            delta = due_ord - today_ord
+            if delta < 0:
                 overdue.append(t)
-            elif d <= next_month:
+            elif delta <= 30:
                 upcoming.append(t)
+                if delta <= 7:
+                    due_7 += 1
             else:
                 future.append(t)
-        # Recently completed
-        try:
-            completed = (supabase.table('tasks').select('*')
-                         .eq('user_id', user_id)
-                         .eq('archived', False)
-                         .eq('is_completed', True)
-                         .order('last_completed', desc=True)
-                         .limit(10)
-                         .execute()).data or []
-        except Exception:
-            completed = (supabase.table('tasks').select('*')
-                         .eq('user_id', user_id)
-                         .eq('is_completed', True)
-                         .order('last_completed', desc=True)
-                         .limit(10)
-                         .execute()).data or []
         # Pick most urgent task (highest priority overdue, or oldest overdue)
         urgent_task = None
         if overdue:
             # Sort by priority (high > medium > low > none) then by due date (oldest first)
             priority_order = {'high': 0, 'medium': 1, 'low': 2, None: 3, '': 3}
-            sorted_overdue = sorted(overdue, key=lambda t: (priority_order.get((t.get('priority') or '').lower(), 3), t.get('next_due_date') or '9999-99-99'))
-            urgent_task = sorted_overdue[0]
+            urgent_task = min(overdue, key=lambda t: (priority_order.get((t.get('priority') or '').lower(), 3), t.get('next_due_date') or '9999-99-99'))
         
+        # ISO dates compare as strings: completed on or after today - 7 days
+        week_ago_iso = (today - timedelta(days=7)).isoformat()
+        completed_7 = sum(1 for t in completed if (t.get('last_completed') or '')[:10] >= week_ago_iso)
         overview = {
             'total_active': len(tasks),
             'overdue_count': len(overdue),
-            'due_7_days': sum(1 for t in tasks if t.get('next_due_date') and today <= datetime.fromisoformat(t['next_due_date']).date() <= today + timedelta(days=7)),
-            'completed_7_days': sum(1 for t in completed if t.get('last_completed') and (today - datetime.fromisoformat(t['last_completed']).date()).days <= 7)
+            'due_7_days': due_7,
+            'completed_7_days': completed_7
         }
         return render_template('dashboard.html', overview=overview, overdue_tasks=overdue, upcoming_tasks=upcoming, future_tasks=future, completed_tasks=completed, urgent_task=urgent_task, baseline_done=True, baseline_dismissed=True, baseline_last_checked=None, baseline_features={})
     except Exception as e:
@@ -909,10 +1279,10 @@ def roadmap():
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        today = datetime.now().date()
+        today = _request_today()
         horizon = today + timedelta(days=56)
         try:
-            res = (supabase.table('tasks').select('*')
+            res = (supabase.table('tasks').select(TASK_LIST_COLS)
                    .eq('user_id', user_id)
                    .eq('archived', False)
                    .eq('is_completed', False)
@@ -921,6 +1291,8 @@ def roadmap():
                    .order('next_due_date')
                    .execute())
         except Exception:
+            # Fallback if an optional column in TASK_LIST_COLS (or 'archived') is not
+            # deployed; archived rows are filtered below since the column may be missing
             res = (supabase.table('tasks').select('*')
                    .eq('user_id', user_id)
                    .eq('is_completed', False)
@@ -928,14 +1300,13 @@ def roadmap():
                    .lte('next_due_date', horizon.isoformat())
                    .order('next_due_date')
                    .execute())
-        rows = res.data or []
+        rows = [r for r in (res.data or []) if not r.get('archived')]
         def week_start(d):
             return d - timedelta(days=d.weekday())
         weeks = {}
         for t in rows:
-            try:
-                due = datetime.fromisoformat((t.get('next_due_date') or '')).date()
-            except Exception:
+            due = _safe_date(t.get('next_due_date'))
+            if due is None:
                 continue
             ws = week_start(due)
             weeks.setdefault(ws, []).append(t)
@@ -956,43 +1327,36 @@ def roadmap():
         flash(f'Failed to load roadmap: {e}')
         return redirect(url_for('dashboard'))
 
+# Month grids for the calendar page start on Sunday
+_SUNDAY_CALENDAR = calendar.Calendar(firstweekday=6)
+
 @app.route('/calendar')
 def calendar_view():
     if 'user_id' not in session:
         return redirect(url_for('login'))
 
     user_id = session['user_id']
+    today = _request_today()
     # Determine target month
     try:
-        year = int(request.args.get('year') or datetime.now().year)
-        month = int(request.args.get('month') or datetime.now().month)
-        first_of_month = datetime(year, month, 1).date()
+        year = int(request.args.get('year') or today.year)
+        month = int(request.args.get('month') or today.month)
+        first_of_month = date(year, month, 1)
     except Exception:
-        first_of_month = datetime.now().date().replace(day=1)
+        first_of_month = today.replace(day=1)
         year = first_of_month.year
         month = first_of_month.month
 
-    # Compute start (Sunday) to end (Saturday) covering the month grid
-    start_weekday = first_of_month.weekday()  # Monday=0..Sunday=6
-    days_back_to_sunday = (start_weekday + 1) % 7
-    grid_start = first_of_month - timedelta(days=days_back_to_sunday)
-
-    # End of month and grid end
-    if month == 12:
-        first_next_month = datetime(year + 1, 1, 1).date()
-    else:
-        first_next_month = datetime(year, month + 1, 1).date()
-    last_of_month = first_next_month - timedelta(days=1)
-    end_weekday = last_of_month.weekday()
-    days_forward_to_saturday = (6 - end_weekday)
-    grid_end = last_of_month + timedelta(days=days_forward_to_saturday)
+    # Full Sunday..Saturday weeks covering the month
+    grid_dates = [d for week in _SUNDAY_CALENDAR.monthdatescalendar(year, month) for d in week]
+    grid_start, grid_end = grid_dates[0], grid_dates[-1]
 
     # Fetch active tasks due within grid window
     try:
         try:
             tasks_result = (supabase
                             .table('tasks')
-                            .select('*')
+                            .select(TASK_LIST_COLS)
                             .eq('user_id', user_id)
                             .eq('is_completed', False)
                             .eq('archived', False)
@@ -1001,6 +1365,8 @@ def calendar_view():
                             .order('next_due_date')
                             .execute())
         except Exception:
+            # Fallback if an optional column in TASK_LIST_COLS (or 'archived') is not
+            # deployed; archived rows are filtered below since the column may be missing
             tasks_result = (supabase
                             .table('tasks')
                             .select('*')
@@ -1010,32 +1376,22 @@ def calendar_view():
                             .lte('next_due_date', grid_end.isoformat())
                             .order('next_due_date')
                             .execute())
-        tasks = tasks_result.data or []
+        tasks = [t for t in (tasks_result.data or []) if not t.get('archived')]
     except Exception:
         tasks = []
 
-    # Group tasks by date
-    by_date = {}
-    for t in tasks:
-        try:
-            d = datetime.fromisoformat(t['next_due_date']).date()
-            by_date.setdefault(d.isoformat(), []).append(t)
-        except Exception:
-            continue
+    # Group tasks by date; rows arrive ordered by next_due_date, so equal
+    # 'YYYY-MM-DD' prefixes are adjacent
+    by_date = {k: list(grp) for k, grp in groupby(tasks, key=lambda t: (t.get('next_due_date') or '')[:10])}
 
     # Build days grid
-    days = []
-    cur = grid_start
-    today = datetime.now().date()
-    while cur <= grid_end:
-        days.append({
-            'date': cur,
-            'in_month': (cur.month == month),
-            'items': by_date.get(cur.isoformat(), []),
-            'is_today': (cur == today),
-            'is_past': (cur < today),
-        })
-        cur += timedelta(days=1)
+    days = [{
+        'date': d,
+        'in_month': (d.month == month),
+        'items': by_date.get(d.isoformat(), []),
+        'is_today': (d == today),
+        'is_past': (d < today),
+    } for d in grid_dates]
 
     # Prev/next month params
     prev_year = year if month > 1 else year - 1
@@ -1101,10 +1457,10 @@ def settings():
                     flash('New password and confirmation do not match')
                     return redirect(url_for('settings'))
                 # Verify current password
-                if not check_password_hash(user.get('password_hash', ''), current_pw):
+                if not _verify_password(user.get('password_hash'), current_pw):
                     flash('Current password is incorrect')
                     return redirect(url_for('settings'))
-                updates['password_hash'] = generate_password_hash(new_pw)
+                updates['password_hash'] = _hash_password(new_pw)
             if updates:
                 supabase.table('users').update(updates).eq('id', user_id).execute()
                 flash('Settings updated')
@@ -1156,10 +1512,10 @@ def questionnaire():
                 'has_pool_hot_tub': request.form.get('has_pool_hot_tub') == 'yes',
                 # Climate
                 'freezes': request.form.get('freezes') == 'yes',
-                'season_spring': f"2024-{request.form.get('season_spring', '03')}-01" if request.form.get('season_spring') else None,
-                'season_summer': f"2024-{request.form.get('season_summer', '06')}-01" if request.form.get('season_summer') else None,
-                'season_autumn': f"2024-{request.form.get('season_autumn', '09')}-01" if request.form.get('season_autumn') else None,
-                'season_winter': f"2024-{request.form.get('season_winter', '12')}-01" if request.form.get('season_winter') else None,
+                'season_spring': _season_start(request.form.get('season_spring')),
+                'season_summer': _season_start(request.form.get('season_summer')),
+                'season_autumn': _season_start(request.form.get('season_autumn')),
+                'season_winter': _season_start(request.form.get('season_winter')),
                 # Lifestyle
                 'has_pets': request.form.get('has_pets') == 'yes',
                 'pet_dog': bool(request.form.get('pet_dog')),
@@ -1168,6 +1524,7 @@ def questionnaire():
                 'travel_often': request.form.get('travel_often') == 'yes',
             }
             # Persist persona and time budget on the users table (NOT in home_features)
+            updates = {}
             try:
                 persona = (request.form.get('persona') or '').strip().lower() or None
                 tb_raw = request.form.get('time_budget')
@@ -1177,22 +1534,15 @@ def questionnaire():
                         time_budget_minutes = int(tb_raw)
                     except Exception:
                         time_budget_minutes = None
-                updates = {}
                 if persona:
                     updates['persona'] = persona
                 if time_budget_minutes is not None:
                     updates['time_budget_minutes_per_week'] = time_budget_minutes
                 if updates:
                     updates['onboarding_started_at'] = datetime.utcnow().isoformat()+'Z'
-                    supabase.table('users').update(updates).eq('id', user_id).execute()
             except Exception:
-                # Non-fatal: ignore if columns do not exist yet
-                pass
-            existing = supabase.table('home_features').select('user_id').eq('user_id', user_id).execute()
-            if existing.data:
-                supabase.table('home_features').update(features).eq('user_id', user_id).execute()
-            else:
-                supabase.table('home_features').insert(features).execute()
+                updates = {}
+            _save_questionnaire(user_id, features, updates)
             # Regenerate tasks using DB templates if available
             diag = seed_tasks_from_static_catalog_or_templates(user_id, features)
             if diag.get('source') == 'error':
@@ -1207,7 +1557,7 @@ def questionnaire():
     # GET: prefill
     prefill = {}
     try:
-        res = supabase.table('home_features').select('*').eq('user_id', user_id).execute()
+        res = supabase.table('home_features').select(_home_feature_select()).eq('user_id', user_id).execute()
         if res.data:
             prefill = res.data[0]
     except Exception:
@@ -1220,78 +1570,78 @@ def questionnaire():
 @app.route('/baseline/dismiss', methods=['POST'])
 def baseline_dismiss():
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     user_id = session['user_id']
     try:
-        existing = supabase.table('home_features').select('user_id').eq('user_id', user_id).execute()
-        payload = {
+        _upsert_home_features(user_id, {
             'baseline_checkup_dismissed': True,
             'baseline_last_checked': datetime.utcnow().isoformat()+'Z'
-        }
-        if existing.data:
-            supabase.table('home_features').update(payload).eq('user_id', user_id).execute()
-        else:
-            payload['user_id'] = user_id
-            supabase.table('home_features').insert(payload).execute()
+        })
         # Also hide CTA immediately this session
         session['baseline_done'] = True
         return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Baseline checkup rules: (answer key, answers that trigger it, title substrings
+# of the tasks to bring forward, days until due, priority or None)
+BASELINE_RULES = (
+    # Exterior issues
+    ('siding_condition', frozenset({'needs_repair'}), ('siding', 'exterior paint', 'paint'), 7, 'high'),
+    ('gutters_last_cleaned', frozenset({'over_12m', 'not_sure'}), ('gutter', 'downspout'), 7, 'high'),
+    # Systems
+    ('hvac_filter_last', frozenset({'over_6m', 'not_sure'}), ('hvac filter', 'replace hvac filter', 'check hvac filters'), 7, 'medium'),
+    ('water_heater_service', frozenset({'over_3y', 'not_sure'}), ('water heater', 'flush hot water heater'), 10, 'medium'),
+    ('sump_pump_tested', frozenset({'not_recently', 'not_sure'}), ('sump pump',), 14, 'medium'),
+    # Appliances
+    ('dishwasher_filter_last', frozenset({'over_6m', 'not_sure'}), ('dishwasher filter',), 10, None),
+    ('dryer_vent_last', frozenset({'over_1y', 'not_sure'}), ('dryer vent',), 10, 'medium'),
+)
+
 def _adjust_tasks_from_baseline(user_id, answers):
     """Lightweight adjustments based on baseline answers.
     Brings forward problem areas; defers pristine ones.
     """
     today = datetime.utcnow().date()
     try:
-        res = supabase.table('tasks').select('id,title,task_key,next_due_date,priority').eq('user_id', user_id).eq('archived', False).execute()
+        rules = []
+        for answer_key, triggers, subs, days, priority in BASELINE_RULES:
+            if answers.get(answer_key) in triggers:
+                pl = {'next_due_date': (today + timedelta(days=days)).isoformat()}
+                if priority:
+                    pl['priority'] = priority
+                rules.append((subs, pl))
+        if not rules:
+            return
+        res = supabase.table('tasks').select('id,title').eq('user_id', user_id).eq('archived', False).execute()
         rows = res.data or []
-        updates = []
-        def bump(ids_or_substrings, days=7, priority=None):
-            for t in rows:
-                title = (t.get('title') or '').lower()
-                if any(s in title for s in ids_or_substrings):
-                    pl = {'next_due_date': (today + timedelta(days=days)).isoformat()}
-                    if priority:
-                        pl['priority'] = priority
-                    updates.append((t['id'], pl))
-        # Exterior issues
-        if answers.get('siding_condition') == 'needs_repair':
-            bump(['siding','exterior paint','paint'], days=7, priority='high')
-        glc = answers.get('gutters_last_cleaned')
-        if glc in ('over_12m','not_sure'):
-            bump(['gutter','downspout'], days=7, priority='high')
-        # Systems
-        hvac = answers.get('hvac_filter_last')
-        if hvac in ('over_6m','not_sure'):
-            bump(['hvac filter','replace hvac filter','check hvac filters'], days=7, priority='medium')
-        wh = answers.get('water_heater_service')
-        if wh in ('over_3y','not_sure'):
-            bump(['water heater','flush hot water heater'], days=10, priority='medium')
-        sump = answers.get('sump_pump_tested')
-        if sump in ('not_recently','not_sure'):
-            bump(['sump pump'], days=14, priority='medium')
-        # Appliances
-        dw = answers.get('dishwasher_filter_last')
-        if dw in ('over_6m','not_sure'):
-            bump(['dishwasher filter'], days=10)
-        dryer = answers.get('dryer_vent_last')
-        if dryer in ('over_1y','not_sure'):
-            bump(['dryer vent'], days=10, priority='medium')
-        # Apply updates
-        for tid, payload in updates:
+        # One pass over the tasks; matching rules are folded in order, so a task
+        # hit by several rules ends up as if each update had been applied in turn
+        merged = {}
+        for t in rows:
+            title = (t.get('title') or '').lower()
+            for subs, pl in rules:
+                if any(sub in title for sub in subs):
+                    merged.setdefault(t['id'], {}).update(pl)
+        by_payload = {}
+        for tid, payload in merged.items():
+            by_payload.setdefault(tuple(sorted(payload.items())), []).append(tid)
+        def _send(item):
+            payload_items, ids = item
             try:
-                supabase.table('tasks').update(payload).eq('user_id', user_id).eq('id', tid).execute()
+                supabase.table('tasks').update(dict(payload_items)).eq('user_id', user_id).in_('id', ids).execute()
             except Exception:
-                continue
+                pass
+        # Payload groups touch disjoint ids; send them concurrently
+        with _tasks_write(user_id):
+            list(_IO_POOL.map(_send, by_payload.items()))
     except Exception as e:
         print(f"Baseline adjust error: {e}")
 
 @app.route('/baseline/apply', methods=['POST'])
 def baseline_apply():
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     user_id = session['user_id']
     try:
         answers = {
@@ -1308,16 +1658,10 @@ def baseline_apply():
         }
         _adjust_tasks_from_baseline(user_id, answers)
         # Persist flags so CTA hides
-        existing = supabase.table('home_features').select('user_id').eq('user_id', user_id).execute()
-        payload = {
+        _upsert_home_features(user_id, {
             'baseline_checkup_dismissed': True,
             'baseline_last_checked': datetime.utcnow().isoformat()+'Z'
-        }
-        if existing.data:
-            supabase.table('home_features').update(payload).eq('user_id', user_id).execute()
-        else:
-            payload['user_id'] = user_id
-            supabase.table('home_features').insert(payload).execute()
+        })
         session['baseline_done'] = True
         flash('Baseline checkup applied to your tasks!')
         return redirect(url_for('dashboard'))
@@ -1336,47 +1680,70 @@ def task_list():
     show_completed = request.args.get('show_completed') == 'true'
     date_filter = request.args.get('date')  # Specific date filter (YYYY-MM-DD)
     
+    target_date = None
+    if date_filter:
+        try:
+            target_date = date.fromisoformat(date_filter[:10])
+        except Exception:
+            target_date = None  # Fall through to normal kanban view
+    
     try:
-        # Base query - get all non-archived tasks
-        query = supabase.table('tasks').select('*').eq('user_id', user_id)
+        # Push plain-text searches into Postgres (ILIKE on title/description).
+        # Queries containing filter syntax or wildcard characters use the exact
+        # substring match below instead, so user input is never parsed as a filter.
+        db_search = bool(search_query) and not (set(search_query) & _SEARCH_RESERVED_CHARS)
         
-        if not show_archived:
-            query = query.eq('archived', False)
+        def _tasks_query(cols):
+            # Base query - get all non-archived tasks
+            query = supabase.table('tasks').select(cols).eq('user_id', user_id)
+            if not show_archived:
+                query = query.eq('archived', False)
+            # Narrow the fetch to what the view renders: one due date for the
+            # date view, and no completed rows unless the kanban shows them
+            if target_date:
+                query = query.eq('next_due_date', target_date.isoformat())
+            elif not show_completed:
+                query = query.eq('is_completed', False)
+            if db_search:
+                query = query.or_(f'title.ilike."*{search_query}*",description.ilike."*{search_query}*"')
+            return query
         
-        res = query.execute()
+        try:
+            res = _tasks_query(TASK_LIST_COLS).execute()
+        except Exception:
+            # Fallback if an optional column in TASK_LIST_COLS is not deployed
+            res = _tasks_query('*').execute()
         all_tasks = res.data or []
         
         # Apply search filter
-        if search_query:
+        if search_query and not db_search:
             search_lower = search_query.lower()
             all_tasks = [t for t in all_tasks if 
                         search_lower in (t.get('title') or '').lower() or 
                         search_lower in (t.get('description') or '').lower()]
         
-        # If date filter is provided, filter to that specific date
-        if date_filter:
-            try:
-                target_date = datetime.fromisoformat(date_filter).date()
-                filtered_tasks = [t for t in all_tasks if t.get('next_due_date') and 
-                                 datetime.fromisoformat(t['next_due_date']).date() == target_date]
-                # Return single column view for date-filtered tasks
-                return render_template('tasks.html',
-                                     overdue_tasks=[],
-                                     this_week_tasks=[],
-                                     this_month_tasks=[],
-                                     later_tasks=[],
-                                     completed_tasks=[],
-                                     date_filtered_tasks=filtered_tasks,
-                                     filter_date=target_date,
-                                     show_archived=show_archived,
-                                     show_completed=show_completed)
-            except Exception:
-                pass  # Fall through to normal kanban view
+        # If date filter is provided, the query already returned only that date
+        if target_date:
+            # Return single column view for date-filtered tasks
+            return render_template('tasks.html',
+                                 overdue_tasks=[],
+                                 this_week_tasks=[],
+                                 this_month_tasks=[],
+                                 later_tasks=[],
+                                 completed_tasks=[],
+                                 date_filtered_tasks=all_tasks,
+                                 filter_date=target_date,
+                                 show_archived=show_archived,
+                                 show_completed=show_completed)
         
-        # Organize tasks into kanban columns
-        today = datetime.now().date()
+        # Organize tasks into kanban columns. YYYY-MM-DD strings order like the
+        # dates they encode, so rows are bucketed by string comparison.
+        today = _request_today()
         end_of_week = today + timedelta(days=(6 - today.weekday()))  # Sunday
         end_of_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        today_iso = today.isoformat()
+        end_of_week_iso = end_of_week.isoformat()
+        end_of_month_iso = end_of_month.isoformat()
         
         overdue_tasks = []
         this_week_tasks = []
@@ -1397,17 +1764,12 @@ def task_list():
                 later_tasks.append(t)
                 continue
             
-            try:
-                due_date = datetime.fromisoformat(nd).date()
-            except Exception:
-                later_tasks.append(t)
-                continue
-            
-            if due_date < today:
+            due_iso = nd[:10]
+            if due_iso < today_iso:
                 overdue_tasks.append(t)
-            elif due_date <= end_of_week:
+            elif due_iso <= end_of_week_iso:
                 this_week_tasks.append(t)
-            elif due_date <= end_of_month:
+            elif due_iso <= end_of_month_iso:
                 this_month_tasks.append(t)
             else:
                 later_tasks.append(t)
@@ -1443,60 +1805,92 @@ def home():
     if 'user_id' not in session:
         return redirect(url_for('login'))
     user_id = session['user_id']
+    today = _request_today()
     features = {}
     overview = None
-    upcoming_tasks = []
     try:
-        res = supabase.table('home_features').select('*').eq('user_id', user_id).execute()
-        if res.data:
-            features = res.data[0]
-    except Exception as e:
-        print(f"Error loading home_features: {e}")
+        # Features row and overview counters in a single RPC
+        res = supabase.rpc('home_page_data', {'p_user_id': user_id, 'p_today': today.isoformat()}).execute()
+        data = res.data or {}
+        features = data.get('features') or {}
+        overview = _overview_from_row(data.get('overview') or {})
+    except Exception:
+        # Fallback if home_page_data has not been created yet. The overview
+        # counters don't depend on the features row; fetch them concurrently
+        overview_future = _IO_POOL.submit(_home_overview, user_id, today)
+        try:
+            res = supabase.table('home_features').select(_home_feature_select()).eq('user_id', user_id).execute()
+            if res.data:
+                features = res.data[0]
+        except Exception as e:
+            print(f"Error loading home_features: {e}")
+        overview = overview_future.result()
+
+    banner_url = (features or {}).get('banner_url')
+    return render_template('home.html', features=features, banner_url=banner_url, overview=overview)
+
+def _overview_from_row(row):
+    """Template overview dict from a home_overview result row."""
+    return {
+        'overdue_count': row.get('overdue_count') or 0,
+        'due_7_days': row.get('due_7_days') or 0,
+        'upcoming_count': row.get('upcoming_count') or 0,
+        'completed_7_days': row.get('completed_30_days') or 0,
+    }
 
-    # Simple overview
+def _home_overview(user_id, today):
+    """Overview counters for the home page (None on error)."""
     try:
-        t_res = supabase.table('tasks').select('*').eq('user_id', user_id).eq('archived', False).execute()
-        all_tasks = t_res.data or []
-        today = datetime.now().date()
-        overdue = []
-        upcoming = []
-        for t in all_tasks:
-            nd = t.get('next_due_date')
-            if not nd:
-                continue
-            try:
-                d = datetime.fromisoformat(nd).date()
-            except Exception:
-                continue
-            if d < today:
-                overdue.append(t)
-            elif d <= today + timedelta(days=30):
-                upcoming.append(t)
-        # Completed last 30 days
-        completed_recent = 0
         try:
-            hist = supabase.table('task_history').select('created_at').eq('user_id', user_id).eq('action', 'completed').order('created_at', desc=True).limit(200).execute()
-            cutoff = datetime.now() - timedelta(days=30)
-            for h in (hist.data or []):
-                try:
-                    ts = datetime.fromisoformat(h['created_at'].replace('Z','+00:00'))
-                    if ts >= cutoff:
-                        completed_recent += 1
-                except Exception:
-                    pass
+            res = supabase.rpc('home_overview', {'p_user_id': user_id, 'p_today': today.isoformat()}).execute()
+            return _overview_from_row((res.data or [{}])[0])
         except Exception:
-            pass
-        overview = {
-            'overdue_count': len(overdue),
-            'due_7_days': sum(1 for t in all_tasks if t.get('next_due_date') and today <= datetime.fromisoformat(t['next_due_date']).date() <= today + timedelta(days=7)),
-            'completed_7_days': completed_recent,
-        }
-        upcoming_tasks = upcoming
+            # Fallback if the home_overview function has not been created yet
+            return _compute_home_overview(user_id, today)
     except Exception as e:
         print(f"Error computing home overview: {e}")
-
-    banner_url = (features or {}).get('banner_url')
-    return render_template('home.html', features=features, banner_url=banner_url, overview=overview, upcoming_tasks=upcoming_tasks)
+        return None
+
+def _compute_home_overview(user_id, today):
+    """Client-side equivalent of the home_overview SQL function."""
+    # Only due dates are needed for the overview counters
+    t_res = supabase.table('tasks').select('id,next_due_date,next_due_ordinal').eq('user_id', user_id).eq('archived', False).execute()
+    today_ord = today.toordinal()
+    overdue = 0
+    upcoming = 0
+    due_7 = 0
+    for t in (t_res.data or []):
+        due_ord = _due_ordinal(t)
+        if due_ord is None:
+            continue
+        delta = due_ord - today_ord
+        if delta < 0:
+            overdue += 1
+        elif delta <= 30:
+            upcoming += 1
+            if delta <= 7:
+                due_7 += 1
+    # Completed last 30 days
+    completed_recent = 0
+    try:
+        # Let Postgres filter and count; limit(1) keeps the payload to one row
+        cutoff_iso = (datetime.utcnow() - timedelta(days=30)).isoformat() + 'Z'
+        hist = (supabase.table('task_history')
+                .select('id', count='exact')
+                .eq('user_id', user_id)
+                .eq('action', 'completed')
+                .gte('created_at', cutoff_iso)
+                .limit(1)
+                .execute())
+        completed_recent = hist.count or 0
+    except Exception:
+        pass
+    return {
+        'overdue_count': overdue,
+        'due_7_days': due_7,
+        'upcoming_count': upcoming,
+        'completed_7_days': completed_recent,
+    }
 
 @app.route('/home/photo', methods=['POST'])
 def upload_home_photo():
@@ -1515,19 +1909,22 @@ def upload_home_photo():
     try:
         bucket = 'home-photos'
         object_path = f"user_{session['user_id']}/banner{ext}"
-        file.stream.seek(0)
-        data = file.read()
-        supabase.storage.from_(bucket).upload(path=object_path, file=data, file_options={
-            'content-type': file.mimetype or f"image/{ext.strip('.')}",
-            'x-upsert': 'true'
-        })
-        public_url = supabase.storage.from_(bucket).get_public_url(object_path)
+        # Spool to disk and hand storage an open file so the image is streamed
+        # to Supabase in chunks rather than held in memory as one bytes object
+        fd, tmp_path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
+        try:
+            file.save(tmp_path)
+            with open(tmp_path, 'rb') as fh:
+                supabase.storage.from_(bucket).upload(path=object_path, file=fh, file_options={
+                    'content-type': file.mimetype or f"image/{ext.strip('.')}",
+                    'x-upsert': 'true'
+                })
+        finally:
+            os.remove(tmp_path)
+        public_url = _PUBLIC_URL_TEMPLATE.format(bucket=bucket, path=object_path)
         user_id = session['user_id']
-        existing = supabase.table('home_features').select('user_id').eq('user_id', user_id).execute()
-        if existing.data:
-            supabase.table('home_features').update({'banner_url': public_url, 'user_id': user_id}).eq('user_id', user_id).execute()
-        else:
-            supabase.table('home_features').insert({'user_id': user_id, 'banner_url': public_url}).execute()
+        _upsert_home_features(user_id, {'banner_url': public_url})
         flash('Photo updated!')
     except Exception as e:
         flash(f'Upload failed. Ensure bucket "home-photos" exists and is public. Error: {e}')
@@ -1539,13 +1936,18 @@ def task_detail(task_id):
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        tres = supabase.table('tasks').select('*').eq('id', task_id).eq('user_id', user_id).execute()
+        # Task and history reads are independent; issue them concurrently
+        hist_future = _IO_POOL.submit(_task_history_rows, task_id, user_id)
+        try:
+            tres = supabase.table('tasks').select(TASK_LIST_COLS).eq('id', task_id).eq('user_id', user_id).execute()
+        except Exception:
+            # Fallback if an optional column in TASK_LIST_COLS is not deployed
+            tres = supabase.table('tasks').select('*').eq('id', task_id).eq('user_id', user_id).execute()
         if not tres.data:
             flash('Task not found')
             return redirect(url_for('task_list'))
         task = tres.data[0]
-        hres = supabase.table('task_history').select('*').eq('task_id', task_id).eq('user_id', user_id).order('created_at', desc=True).execute()
-        history = hres.data or []
+        history = hist_future.result()
         return render_template('task_detail.html', task=task, history=history)
     except Exception as e:
         flash(f'Error loading task: {e}')
@@ -1554,13 +1956,13 @@ def task_detail(task_id):
 @app.route('/restore_task/<int:task_id>', methods=['POST'])
 def restore_task(task_id):
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     user_id = session['user_id']
     try:
-        res = supabase.table('tasks').select('id,archived').eq('id', task_id).eq('user_id', user_id).execute()
+        with _tasks_write(user_id):
+            res = supabase.table('tasks').update({'archived': False}).eq('id', task_id).eq('user_id', user_id).execute()
         if not res.data:
-            return jsonify({'error': 'Task not found'}), 404
-        supabase.table('tasks').update({'archived': False}).eq('id', task_id).eq('user_id', user_id).execute()
+            return _json_error(_ERR_TASK_NOT_FOUND, 404)
         return jsonify({'message': 'Task restored'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1576,14 +1978,29 @@ def catalog_admin():
             return redirect(url_for('catalog_admin'))
         try:
             headers, rows = _read_csv_upload(file)
-            # Save as-is to static/tasks_catalog.csv
-            target = os.path.join(app.root_path, 'static', 'tasks_catalog.csv')
-            with open(target, 'w', encoding='utf-8') as out:
-                writer = csv.DictWriter(out, fieldnames=headers)
-                writer.writeheader()
-                for r in rows:
-                    writer.writerow(r)
-            flash(f'Catalog updated: {len(rows)} rows written.')
+            # Save as-is to static/tasks_catalog.csv: stream rows into a temp file, then
+            # swap it in so a failed upload never leaves a partial catalog. The temp file
+            # lives in the app root (same filesystem, not served from static/).
+            fd, tmp_path = tempfile.mkstemp(dir=app.root_path, prefix='.tasks_catalog.', suffix='.tmp')
+            written = 0
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as out:
+                    writer = csv.DictWriter(out, fieldnames=headers)
+                    writer.writeheader()
+                    for r in rows:
+                        writer.writerow(r)
+                        written += 1
+                # mkstemp creates 0600; keep the catalog's existing mode (or world-readable)
+                try:
+                    mode = stat.S_IMODE(os.stat(_CATALOG_PATH).st_mode)
+                except OSError:
+                    mode = 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, _CATALOG_PATH)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            flash(f'Catalog updated: {written} rows written.')
             return redirect(url_for('catalog_admin'))
         except Exception as e:
             flash(f'Failed to update catalog: {e}')
@@ -1596,9 +2013,9 @@ def regenerate_tasks():
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        fres = supabase.table('home_features').select('*').eq('user_id', user_id).execute()
+        fres = supabase.table('home_features').select(_home_feature_select()).eq('user_id', user_id).execute()
         features_row = fres.data[0] if fres.data else {}
-        feature_flags = {k: bool(features_row.get(k, False)) for k in ALLOWED_FEATURE_KEYS}
+        feature_flags = {k: bool(features_row.get(k)) for k in _ALLOWED_FEATURE_KEYS_T}
         # Seed from DB templates first, fallback to CSV
         diag = seed_tasks_from_static_catalog_or_templates(user_id, feature_flags)
         if diag.get('source') == 'error':
@@ -1644,11 +2061,7 @@ def save_home_basics():
         'baths': baths,
     }
     try:
-        existing = supabase.table('home_features').select('id').eq('user_id', user_id).execute()
-        if existing.data:
-            supabase.table('home_features').update(payload).eq('user_id', user_id).execute()
-        else:
-            supabase.table('home_features').insert(payload).execute()
+        _upsert_home_features(user_id, payload)
         flash('Home basics saved')
     except Exception as e:
         flash(f'Failed to save basics: {e}')
@@ -1660,88 +2073,128 @@ def complete_task(task_id):
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        res = supabase.table('tasks').select('*').eq('id', task_id).eq('user_id', user_id).execute()
-        if not res.data:
+        with _tasks_write(user_id):
+            done = _complete_task_row(task_id, user_id, _request_today())
+        if not done:
             flash('Task not found')
             return redirect(url_for('dashboard'))
-        task = res.data[0]
-        today = datetime.now().date()
-        next_due = today + timedelta(days=task['frequency_days'])
-        
-        # Update task
-        supabase.table('tasks').update({
-            'is_completed': True, 
-            'last_completed': today.isoformat(), 
-            'next_due_date': next_due.isoformat()
-        }).eq('id', task_id).execute()
-        
-        # Create history entry
-        try:
-            supabase.table('task_history').insert({
-                'task_id': task_id,
-                'user_id': user_id,
-                'action': 'completed',
-                'created_at': datetime.now().isoformat()
-            }).execute()
-        except Exception as hist_error:
-            print(f"Warning: Could not create history entry: {hist_error}")
-        
-        flash(f'Task "{task["title"]}" completed! Next due: {next_due}')
+        title, next_due = done
+        flash(f'Task "{title}" completed! Next due: {next_due}')
     except Exception as e:
         flash(f'Error completing task: {e}')
     return redirect(url_for('dashboard'))
 
+def _complete_task_row(task_id, user_id, today):
+    """Mark a task completed, roll its due date forward and log history.
+    Uses the complete_task RPC (one request); falls back to select + update.
+    Returns (title, next_due_iso), or None if the user has no such task.
+    """
+    try:
+        res = supabase.rpc('complete_task', {
+            'p_task_id': task_id,
+            'p_user_id': user_id,
+            'p_today': today.isoformat(),
+        }).execute()
+        if not res.data:
+            return None
+        row = res.data[0]
+        return row.get('title'), row.get('next_due_date')
+    except Exception as e:
+        print(f"complete_task RPC unavailable, using select+update: {e}")
+
+    res = supabase.table('tasks').select('title,frequency_days').eq('id', task_id).eq('user_id', user_id).execute()
+    if not res.data:
+        return None
+    task = res.data[0]
+    next_due = today + timedelta(days=task['frequency_days'])
+    
+    # Update task
+    supabase.table('tasks').update({
+        'is_completed': True, 
+        'last_completed': today.isoformat(), 
+        'next_due_date': next_due.isoformat()
+    }).eq('id', task_id).execute()
+    
+    # Create history entry
+    try:
+        supabase.table('task_history').insert({
+            'task_id': task_id,
+            'user_id': user_id,
+            'action': 'completed'
+        }).execute()
+    except Exception as hist_error:
+        print(f"Warning: Could not create history entry: {hist_error}")
+    return task['title'], next_due.isoformat()
+
 @app.route('/reset_task/<int:task_id>')
 def reset_task(task_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     user_id = session['user_id']
     try:
-        res = supabase.table('tasks').select('id').eq('id', task_id).eq('user_id', user_id).execute()
-        if not res.data:
+        with _tasks_write(user_id):
+            found = _reset_task_row(task_id, user_id)
+        if not found:
             flash('Task not found')
             return redirect(url_for('dashboard'))
-        
-        # Update task
-        supabase.table('tasks').update({
-            'is_completed': False, 
-            'last_completed': None
-        }).eq('id', task_id).execute()
-        
-        # Create history entry
-        try:
-            supabase.table('task_history').insert({
-                'task_id': task_id,
-                'user_id': user_id,
-                'action': 'reset',
-                'created_at': datetime.now().isoformat()
-            }).execute()
-        except Exception as hist_error:
-            print(f"Warning: Could not create history entry: {hist_error}")
-        
         flash('Task reset to active')
     except Exception as e:
         flash(f'Error resetting task: {e}')
     return redirect(url_for('dashboard'))
 
+def _reset_task_row(task_id, user_id):
+    """Mark a task active again and log history. Returns False if the user has no such task.
+    Uses the reset_task RPC (one request); falls back to update + history insert.
+    """
+    try:
+        res = supabase.rpc('reset_task', {'p_task_id': task_id, 'p_user_id': user_id}).execute()
+        return bool(res.data)
+    except Exception as e:
+        print(f"reset_task RPC unavailable, using update + history insert: {e}")
+
+    # Update task; the user_id filter doubles as the ownership check
+    res = supabase.table('tasks').update({
+        'is_completed': False, 
+        'last_completed': None
+    }).eq('id', task_id).eq('user_id', user_id).execute()
+    if not res.data:
+        return False
+    
+    # Create history entry
+    try:
+        supabase.table('task_history').insert({
+            'task_id': task_id,
+            'user_id': user_id,
+            'action': 'reset'
+        }).execute()
+    except Exception as hist_error:
+        print(f"Warning: Could not create history entry: {hist_error}")
+    return True
+
 def _next_anchor_date(month, day, today=None):
     """Return the next occurrence of a given month/day anchor date from today."""
     if today is None:
-        today = datetime.now().date()
+        today = date.today()
+    return _next_anchor_date_cached(month, day, today.toordinal())
+
+@lru_cache(maxsize=64)
+def _next_anchor_date_cached(month, day, today_ordinal):
+    # Same (month, day, today) repeats for every seasonal row in a seeding run
+    today = date.fromordinal(today_ordinal)
     try:
-        this_year = datetime(today.year, month, day).date()
+        this_year = date(today.year, month, day)
         if this_year >= today:
             return this_year
-        return datetime(today.year + 1, month, day).date()
+        return date(today.year + 1, month, day)
     except ValueError:
         # Invalid date (e.g., Feb 30) - fallback to end of month
         if month == 2:
-            return datetime(today.year, 2, 28).date()
+            return date(today.year, 2, 28)
         return today + timedelta(days=365)
 
 def _compute_next_due_date(row, today=None):
     if today is None:
-        today = datetime.now().date()
+        today = date.today()
     seasonal = _parse_bool(row.get('seasonal'), default=False)
     if seasonal:
         anchor_type = (row.get('seasonal_anchor_type') or '').strip().lower()
@@ -1766,66 +2219,73 @@ def _compute_next_due_date(row, today=None):
     return today + timedelta(days=freq)
 
 def _read_csv_upload(file_storage):
+    """Return (headers, row iterator) for an uploaded CSV.
+    Rows are decoded from the upload stream as they are consumed, not read up front.
+    """
     if not file_storage:
         raise ValueError('No file provided')
-    content = file_storage.read()
-    try:
-        text = content.decode('utf-8-sig')
-    except Exception:
-        text = content.decode('utf-8', errors='ignore')
-    sio = io.StringIO(text)
-    reader = csv.DictReader(sio)
-    rows = [dict(r) for r in reader]
+    text = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', errors='ignore', newline='')
+    reader = csv.DictReader(text)
     headers = reader.fieldnames or []
-    return headers, rows
+    return headers, reader
 
 def _filter_rows_by_features(rows, features):
     """Return only rows whose feature_requirements all match the user's features."""
+    # Resolve the user's features once into the set of enabled keys
+    enabled = {k for k, v in features.items() if v and k != 'has_carpet'}
+    # Special handling for has_carpet (stored as 'yes'/'no'/'some')
+    if features.get('carpet', '') in ('yes', 'some'):
+        enabled.add('has_carpet')
+    enabled = frozenset(enabled)
     kept = []
     for r in rows:
         req, req_errors = _parse_feature_requirements(r.get('feature_requirements'))
         if req_errors:
             # invalid reqs -> drop in importer (validator will report)
             continue
-        ok = True
-        for k, v in req.items():
-            # Special handling for has_carpet (stored as 'yes'/'no'/'some')
-            if k == 'has_carpet':
-                carpet_value = features.get('carpet', '')
-                has_carpet = carpet_value in ('yes', 'some')
-                if has_carpet != bool(v):
-                    ok = False
-                    break
-            else:
-                if bool(features.get(k, False)) != bool(v):
-                    ok = False
-                    break
-        if ok:
+        if all((k in enabled) is v for k, v in req.items()):
             kept.append(r)
     return kept
 
 def _resolve_overlaps(rows):
+    ungrouped = []
+    # group -> (rank, row) of the best variant seen so far
     by_group = {}
     for r in rows:
         group = (r.get('overlap_group') or '').strip()
         if not group:
-            # Use unique key per row when no group
-            key = f"__unique__::{r.get('task_key') or r.get('title')}::{id(r)}"
-            by_group[key] = r
+            ungrouped.append(r)
             continue
         rank = _parse_int(r.get('variant_rank'), default=999999)
         cur = by_group.get(group)
-        if cur is None or _parse_int(cur.get('variant_rank'), default=999999) > rank:
-            by_group[group] = r
-    return list(by_group.values())
+        if cur is None or cur[0] > rank:
+            by_group[group] = (rank, r)
+    return ungrouped + [r for _, r in by_group.values()]
 
-def _insert_tasks_for_user(user_id, rows):
+def _probe_task_key_support():
+    """Check once per process whether tasks.task_key is visible to PostgREST."""
+    global TASK_KEY_SUPPORTED, TASK_KEY_PROBED
+    try:
+        supabase.table('tasks').select('task_key').limit(0).execute()
+        TASK_KEY_PROBED = True
+    except Exception as e:
+        if 'task_key' in str(e).lower():
+            print(f"tasks.task_key unavailable, seeding without it: {e}")
+            TASK_KEY_SUPPORTED = False
+            TASK_KEY_PROBED = True
+        # Other failures (network etc.) leave the flag alone and probe again next time
+
+def _insert_tasks_for_user(user_id, rows, today=None):
+    """Build task payloads from catalog rows and insert them. Returns the number of rows inserted."""
     # Ensure optional feature flag exists even if constant was removed
     global TASK_KEY_SUPPORTED
     if 'TASK_KEY_SUPPORTED' not in globals():
         TASK_KEY_SUPPORTED = False
+    if TASK_KEY_SUPPORTED and not TASK_KEY_PROBED:
+        _probe_task_key_support()
     to_insert = []
-    today = datetime.now().date()
+    if today is None:
+        today = date.today()
     for r in rows:
         title = (r.get('title') or '').strip()
         if not title:
@@ -1877,43 +2337,55 @@ def _insert_tasks_for_user(user_id, rows):
         to_insert.append(payload)
 
     if to_insert:
-        # Insert in batches to avoid payload/row limits
-        batch_size = 50
-        for i in range(0, len(to_insert), batch_size):
-            batch = to_insert[i:i+batch_size]
+        # Insert in batches to avoid payload/row limits. Batches are independent,
+        # so issue them concurrently; each call is dominated by network RTT.
+        batches = [to_insert[i:i+INSERT_BATCH_SIZE] for i in range(0, len(to_insert), INSERT_BATCH_SIZE)]
+        with _tasks_write(user_id):
+            if len(batches) == 1:
+                return _insert_task_batch(batches[0], 1)
+            with ThreadPoolExecutor(max_workers=INSERT_BATCH_WORKERS) as pool:
+                return sum(pool.map(_insert_task_batch, batches, range(1, len(batches) + 1)))
+    return 0
+
+def _insert_task_batch(batch, batch_no):
+    """Insert one batch of task payloads, retrying without optional columns on failure.
+    Returns the number of rows inserted.
+    """
+    global TASK_KEY_SUPPORTED
+    try:
+        res = supabase.table('tasks').insert(batch).execute()
+        return len(res.data or [])
+    except Exception as e:
+        msg = str(e)
+        print(f"Error inserting batch {batch_no}: {msg}")
+        # If the failure is due to missing/uncached task_key column, strip it and retry once
+        if 'task_key' in msg.lower():
+            TASK_KEY_SUPPORTED = False
+            sanitized = []
+            for row in batch:
+                if 'task_key' in row:
+                    row = dict(row)
+                    row.pop('task_key', None)
+                sanitized.append(row)
             try:
-                supabase.table('tasks').insert(batch).execute()
-            except Exception as e:
-                msg = str(e)
-                print(f"Error inserting batch {i//batch_size+1}: {msg}")
-                # If the failure is due to missing/uncached task_key column, strip it and retry once
-                if 'task_key' in msg.lower():
-                    TASK_KEY_SUPPORTED = False
-                    sanitized = []
-                    for row in batch:
-                        if 'task_key' in row:
-                            row = dict(row)
-                            row.pop('task_key', None)
-                        sanitized.append(row)
-                    try:
-                        supabase.table('tasks').insert(sanitized).execute()
-                        print(f"Retried batch {i//batch_size+1} without task_key and succeeded.")
-                        continue
-                    except Exception as e2:
-                        print(f"Retry without task_key failed for batch {i//batch_size+1}: {e2}")
-                # Generic fallback: strip optional columns and retry minimal payload
-                # Only include core columns that should exist in all deployments
-                MIN_KEYS = {'user_id','title','description','frequency_days','next_due_date','is_completed'}
-                minimal = []
-                for row in batch:
-                    minimal.append({k: v for k, v in row.items() if k in MIN_KEYS})
-                try:
-                    supabase.table('tasks').insert(minimal).execute()
-                    print(f"Retried batch {i//batch_size+1} with minimal columns and succeeded.")
-                except Exception as e3:
-                    print(f"Retry with minimal columns failed for batch {i//batch_size+1}: {e3}")
-                # Continue with remaining batches to salvage progress
-                continue
+                res = supabase.table('tasks').insert(sanitized).execute()
+                print(f"Retried batch {batch_no} without task_key and succeeded.")
+                return len(res.data or [])
+            except Exception as e2:
+                print(f"Retry without task_key failed for batch {batch_no}: {e2}")
+    # Generic fallback: strip optional columns and retry minimal payload
+    # Only include core columns that should exist in all deployments
+    MIN_KEYS = {'user_id','title','description','frequency_days','next_due_date','is_completed'}
+    minimal = []
+    for row in batch:
+        minimal.append({k: v for k, v in row.items() if k in MIN_KEYS})
+    try:
+        res = supabase.table('tasks').insert(minimal).execute()
+        print(f"Retried batch {batch_no} with minimal columns and succeeded.")
+        return len(res.data or [])
+    except Exception as e3:
+        print(f"Retry with minimal columns failed for batch {batch_no}: {e3}")
+        return 0
 
 def _enrich_task_rows_defaults(rows):
     """Mutate in-place: add sensible defaults for missing fields based on title/metadata.
@@ -1993,7 +2465,7 @@ def _apply_onboarding_ramp(user_id, rows, today=None, first_seed=False):
     if not first_seed or not RAMP_SETTINGS.get('enabled', True):
         return rows
     if today is None:
-        today = datetime.now().date()
+        today = date.today()
 
     # Defaults from global settings
     near_term_days = int(RAMP_SETTINGS.get('near_term_days', 21))
@@ -2039,6 +2511,7 @@ def _apply_onboarding_ramp(user_id, rows, today=None, first_seed=False):
 
     # Prepare scored list
     scored = []
+    days_out_by_row = {}
     immediate = []
     later = []
     for r in rows:
@@ -2048,6 +2521,7 @@ def _apply_onboarding_ramp(user_id, rows, today=None, first_seed=False):
         # compute next_due as if no offset
         nd = _compute_next_due_date(r, today)
         days_out = (nd - today).days
+        days_out_by_row[id(r)] = days_out
         # Identify long-interval tasks for deferral in onboarding
         try:
             freq_days = int(r.get('frequency_days') or 0)
@@ -2075,7 +2549,7 @@ def _apply_onboarding_ramp(user_id, rows, today=None, first_seed=False):
             later.append(r)
 
     # Pull near-term seasonal into immediate
-    near_term = [r for r in later if _parse_bool(r.get('seasonal'), default=False) and (_compute_next_due_date(r, today) - today).days <= near_term_days]
+    near_term = [r for r in later if _parse_bool(r.get('seasonal'), default=False) and days_out_by_row[id(r)] <= near_term_days]
     for r in near_term:
         if r in later:
             later.remove(r)
@@ -2157,7 +2631,7 @@ def _apply_onboarding_ramp(user_id, rows, today=None, first_seed=False):
             daily_count += 1
     return rows
 
-def _backfill_from_templates(user_id, features):
+def _backfill_from_templates(user_id, features, today=None):
     """Insert tasks from TASK_TEMPLATES for enabled features that are not already present.
     Uses title-based de-duplication so catalog entries win.
     """
@@ -2166,7 +2640,10 @@ def _backfill_from_templates(user_id, features):
         existing = supabase.table('tasks').select('title').eq('user_id', user_id).execute()
         existing_titles = { (row.get('title') or '').strip().lower() for row in (existing.data or []) }
         to_insert = []
-        today = datetime.now().date()
+        if today is None:
+            today = date.today()
+        # Templates share a handful of frequencies; compute each due date once
+        due_by_freq = {}
         for feature, enabled in features.items():
             if not enabled:
                 continue
@@ -2189,13 +2666,15 @@ def _backfill_from_templates(user_id, features):
                     'priority': t.get('priority'),
                 }
                 _enrich_task_rows_defaults([row_like])
-                next_due = today + timedelta(days=freq)
+                next_due = due_by_freq.get(freq)
+                if next_due is None:
+                    next_due = due_by_freq[freq] = (today + timedelta(days=freq)).isoformat()
                 to_insert.append({
                     'user_id': user_id,
                     'title': row_like.get('title'),
                     'description': row_like.get('description'),
                     'frequency_days': row_like.get('frequency_days'),
-                    'next_due_date': next_due.isoformat(),
+                    'next_due_date': next_due,
                     'is_completed': False,
                     'priority': row_like.get('priority'),
                     'category': row_like.get('category'),
@@ -2204,11 +2683,12 @@ def _backfill_from_templates(user_id, features):
                     'season_code': (row_like.get('season_code') or None),
                 })
         if to_insert:
-            supabase.table('tasks').insert(to_insert).execute()
+            with _tasks_write(user_id):
+                supabase.table('tasks').insert(to_insert).execute()
     except Exception as e:
         print(f"Error backfilling templates: {e}")
 
-def seed_tasks_from_catalog_rows(user_id, features, all_rows):
+def seed_tasks_from_catalog_rows(user_id, features, all_rows, today=None):
     """Clear existing tasks and seed from provided catalog rows, filtered & overlap-resolved.
     Applies onboarding ramp on first seed to avoid overwhelming the user.
     Returns a dict with diagnostics: {'considered': int, 'matched': int, 'inserted': int}
@@ -2223,9 +2703,10 @@ def seed_tasks_from_catalog_rows(user_id, features, all_rows):
         if ures.data:
             started_raw = ures.data[0].get('onboarding_started_at')
             if started_raw:
-                started = datetime.fromisoformat(str(started_raw).replace('Z', '+00:00'))
-                account_age_days = (datetime.utcnow() - started).days
-                if account_age_days <= 14:
+                # UTC ISO-8601 timestamps order lexicographically; compare the
+                # 'YYYY-MM-DDTHH:MM:SS' prefix against the cutoff instead of parsing
+                cutoff_iso = (datetime.utcnow() - timedelta(days=15)).isoformat()[:19]
+                if str(started_raw)[:19] >= cutoff_iso:
                     ramp_mode = True
             else:
                 # No onboarding_started_at yet -> treat as ramp mode
@@ -2236,32 +2717,28 @@ def seed_tasks_from_catalog_rows(user_id, features, all_rows):
         ramp_mode = True
 
     # Clear only upcoming/future active tasks (preserve completed and overdue)
-    today_iso = datetime.now().date().isoformat()
-    # Delete active, non-archived tasks due today or later
-    try:
-        supabase.table('tasks').delete() \
-            .eq('user_id', user_id) \
-            .eq('archived', False) \
-            .eq('is_completed', False) \
-            .gte('next_due_date', today_iso) \
-            .execute()
-        # Also delete undated active tasks (no next_due_date)
-        supabase.table('tasks').delete() \
-            .eq('user_id', user_id) \
-            .eq('archived', False) \
-            .eq('is_completed', False) \
-            .is_('next_due_date', None) \
-            .execute()
-    except Exception as e:
-        print(f"Selective clear failed, falling back to full clear of active tasks: {e}")
+    if today is None:
+        today = date.today()
+    today_iso = today.isoformat()
+    with _tasks_write(user_id):
+        # Delete active, non-archived tasks due today or later, plus undated ones, in one statement
         try:
             supabase.table('tasks').delete() \
                 .eq('user_id', user_id) \
                 .eq('archived', False) \
                 .eq('is_completed', False) \
+                .or_(f'next_due_date.gte.{today_iso},next_due_date.is.null') \
                 .execute()
-        except Exception as e2:
-            print(f"Fallback clear failed: {e2}")
+        except Exception as e:
+            print(f"Selective clear failed, falling back to full clear of active tasks: {e}")
+            try:
+                supabase.table('tasks').delete() \
+                    .eq('user_id', user_id) \
+                    .eq('archived', False) \
+                    .eq('is_completed', False) \
+                    .execute()
+            except Exception as e2:
+                print(f"Fallback clear failed: {e2}")
     considered = len(all_rows or [])
     filtered = _filter_rows_by_features(all_rows, features)
     # During ramp mode, ignore CSV-provided start_offset_days so code drives staggering
@@ -2273,7 +2750,7 @@ def seed_tasks_from_catalog_rows(user_id, features, all_rows):
     filtered = _enrich_task_rows_defaults(filtered)
     resolved = _resolve_overlaps(filtered)
     # Apply ramp in ramp_mode (first seed or within onboarding window)
-    resolved = _apply_onboarding_ramp(user_id, resolved, today=datetime.now().date(), first_seed=ramp_mode)
+    resolved = _apply_onboarding_ramp(user_id, resolved, today=today, first_seed=ramp_mode)
     # Safety net: ensure annual+ non-safety tasks are not day-1 during ramp
     if ramp_mode:
         for r in resolved:
@@ -2285,29 +2762,39 @@ def seed_tasks_from_catalog_rows(user_id, features, all_rows):
                 so = _parse_int(r.get('start_offset_days'), default=None)
                 if so is None or so < 90:
                     r['start_offset_days'] = '90'
-    before = 0
-    try:
-        br = supabase.table('tasks').select('id', count='exact').eq('user_id', user_id).execute()
-        before = br.count or 0
-    except Exception:
-        pass
-    _insert_tasks_for_user(user_id, resolved)
-    after = before
-    try:
-        ar = supabase.table('tasks').select('id', count='exact').eq('user_id', user_id).execute()
-        after = ar.count or before
-    except Exception:
-        pass
-    inserted = max(0, after - before)
+    # Count from the insert responses rather than exact-count queries before/after
+    inserted = _insert_tasks_for_user(user_id, resolved, today=today)
     return {'considered': considered, 'matched': len(filtered), 'inserted': inserted}
 
+_CATALOG_PATH = os.path.join(app.root_path, 'static', 'tasks_catalog.csv')
+
+# Parsed static/tasks_catalog.csv, invalidated when the file's mtime or size changes
+_CATALOG_CACHE = {'stamp': None, 'headers': None, 'rows': None}
+
+def _load_catalog(path):
+    """Return (headers, rows) for the static CSV catalog, or (None, None) if missing.
+    Rows are fresh dict copies since seeding mutates them in place.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    stamp = (st.st_mtime_ns, st.st_size)
+    if _CATALOG_CACHE['stamp'] != stamp:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            rows = [dict(r) for r in reader]
+            headers = reader.fieldnames or []
+        _CATALOG_CACHE.update(stamp=stamp, headers=headers, rows=rows)
+    return list(_CATALOG_CACHE['headers']), [dict(r) for r in _CATALOG_CACHE['rows']]
+
 def seed_tasks_from_static_catalog_or_templates(user_id, features):
     """If a static CSV catalog exists, seed from it; otherwise use TASK_TEMPLATES.
     Returns diagnostics dict: {'source': 'db'|'csv'|'memory', 'considered': int, 'matched': int, 'inserted': int}
     """
+    # One clock read for the whole seeding run; helpers receive it explicitly
+    today = _request_today()
     try:
-        root_dir = os.path.dirname(os.path.abspath(__file__))
-        static_catalog = os.path.join(root_dir, 'static', 'tasks_catalog.csv')
         # Prefer DB templates (public.task_templates)
         # Try to read DB templates; do not assume an 'active' column exists
         try:
@@ -2337,27 +2824,23 @@ def seed_tasks_from_static_catalog_or_templates(user_id, features):
                     'variant_rank': r.get('variant_rank'),
                     'estimated_minutes': r.get('estimated_minutes'),
                 })
-            diag = seed_tasks_from_catalog_rows(user_id, features, rows)
+            diag = seed_tasks_from_catalog_rows(user_id, features, rows, today=today)
             diag['source'] = 'db'
             return diag
 
         # Fallback to CSV if DB has no templates yet
-        if os.path.isfile(static_catalog):
-            with open(static_catalog, 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                rows = [dict(r) for r in reader]
-            seed_tasks_from_catalog_rows(user_id, features, rows)
-            return True
+        _headers, rows = _load_catalog(_CATALOG_PATH)
+        if rows is not None:
+            diag = seed_tasks_from_catalog_rows(user_id, features, rows, today=today)
+            diag['source'] = 'csv'
+            return diag
         else:
             # Fallback to in-memory templates
-            all_rows = []
-            for feature, enabled in features.items():
-                if not enabled:
-                    continue
-                for t in TASK_TEMPLATES.get(feature, []):
-                    all_rows.append(dict(t))
+            all_rows = [dict(t)
+                        for feature, enabled in features.items() if enabled
+                        for t in TASK_TEMPLATES.get(feature, ())]
             if all_rows:
-                diag = seed_tasks_from_catalog_rows(user_id, features, all_rows)
+                diag = seed_tasks_from_catalog_rows(user_id, features, all_rows, today=today)
                 diag['source'] = 'memory'
                 return diag
             return {'source': 'none', 'considered': 0, 'matched': 0, 'inserted': 0}
@@ -2433,10 +2916,10 @@ def send_overdue_notifications():
                 continue
             
             # Get overdue tasks for this user
-            today = datetime.now().date().isoformat()
+            today = date.today().isoformat()
             try:
                 overdue_result = (supabase.table('tasks')
-                                 .select('*')
+                                 .select(DIGEST_TASK_COLS)
                                  .eq('user_id', user_id)
                                  .eq('is_completed', False)
                                  .lt('next_due_date', today)
@@ -2485,7 +2968,7 @@ def send_weekly_checkin():
         
         app_url = os.getenv('APP_URL', 'http://localhost:5000')
         sent_count = 0
-        today = datetime.now().date()
+        today = date.today()
         week_start = today
         week_end = today + timedelta(days=7)
         month_start = today.replace(day=1)
@@ -2540,7 +3023,7 @@ def send_weekly_checkin():
                 # Get top tasks for this week (prioritize overdue, then high priority, then soonest)
                 try:
                     tasks_result = (supabase.table('tasks')
-                                   .select('*')
+                                   .select(DIGEST_TASK_COLS)
                                    .eq('user_id', user_id)
                                    .eq('is_completed', False)
                                    .lte('next_due_date', week_end.isoformat())
@@ -2552,10 +3035,11 @@ def send_weekly_checkin():
                     top_tasks = []
                 
                 # Sort tasks: overdue first, then by priority, then by due date
+                today_iso = today.isoformat()
+                priority_order = {'high': 0, 'medium': 1, 'low': 2, None: 3, '': 3}
                 def task_sort_key(t):
                     due = t.get('next_due_date', '9999-99-99')
-                    is_overdue = due < today.isoformat()
-                    priority_order = {'high': 0, 'medium': 1, 'low': 2, None: 3, '': 3}
+                    is_overdue = due < today_iso
                     pri = priority_order.get((t.get('priority') or '').lower(), 3)
                     return (0 if is_overdue else 1, pri, due)
                 
@@ -2590,7 +3074,7 @@ def send_weekly_checkin():
 def admin_send_notifications():
     """Manual trigger for sending overdue notifications (admin only)."""
     if 'user_id' not in session:
-        return jsonify({'error': 'Not authenticated'}), 401
+        return _json_error(_ERR_NOT_AUTHENTICATED, 401)
     
     # TODO: Add admin check here if needed
     try:
@@ -2640,7 +3124,7 @@ def test_email():
             return redirect(url_for('dashboard'))
         
         # Get stats for test email
-        today = datetime.now().date()
+        today = _request_today()
         week_end = today + timedelta(days=7)
         month_start = today.replace(day=1)
         
@@ -2684,7 +3168,7 @@ def test_email():
         # Get top tasks
         try:
             tasks_result = (supabase.table('tasks')
-                           .select('*')
+                           .select(DIGEST_TASK_COLS)
                            .eq('user_id', user_id)
                            .eq('is_completed', False)
                            .lte('next_due_date', week_end.isoformat())
@@ -2721,6 +3205,13 @@ def test_email():
 def page_not_found(e):
     return render_template('404.html'), 404
 
+@app.errorhandler(413)
+def request_entity_too_large(e):
+    if request.endpoint == 'upload_home_photo':
+        flash(f'Image is too large. Please upload a file under {HOME_PHOTO_MAX_BYTES // (1024 * 1024)} MB.')
+        return redirect(url_for('home'))
+    return e
+
 @app.errorhandler(500)
 def internal_server_error(e):
     return render_template('500.html'), 500
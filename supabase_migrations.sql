@@ -407,4 +407,215 @@ BEGIN
     ) THEN
         ALTER TABLE public.tasks ADD COLUMN estimated_minutes integer;
     END IF;
-END$$;
\ No newline at end of file
+END$$;
+
+-- 10) (Withdrawn) tasks_distinct_titles only served template backfill, which nothing calls;
+-- drop it where an earlier run of this file created it
+DROP FUNCTION IF EXISTS public.tasks_distinct_titles(integer);
+
+-- 11) One home_features row per user, so writes can upsert ON CONFLICT (user_id)
+-- (fails if duplicate rows already exist; remove extras first)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_home_features_user_unique ON public.home_features(user_id);
+
+-- 12) Trigram indexes for the task list search (title/description ILIKE '%q%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON public.tasks USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_tasks_description_trgm ON public.tasks USING gin (description gin_trgm_ops);
+
+-- 13) Day ordinal of next_due_date (matches Python's date.toordinal()), maintained by trigger
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'tasks' AND column_name = 'next_due_ordinal') THEN
+        ALTER TABLE public.tasks ADD COLUMN next_due_ordinal integer;
+    END IF;
+END$$;
+
+CREATE OR REPLACE FUNCTION public.tasks_set_next_due_ordinal()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.next_due_ordinal := CASE
+        WHEN NEW.next_due_date IS NULL THEN NULL
+        ELSE (NEW.next_due_date::date - DATE '0001-01-01') + 1
+    END;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_tasks_next_due_ordinal ON public.tasks;
+CREATE TRIGGER trg_tasks_next_due_ordinal
+    BEFORE INSERT OR UPDATE OF next_due_date ON public.tasks
+    FOR EACH ROW EXECUTE FUNCTION public.tasks_set_next_due_ordinal();
+
+UPDATE public.tasks
+SET next_due_ordinal = (next_due_date::date - DATE '0001-01-01') + 1
+WHERE next_due_date IS NOT NULL AND next_due_ordinal IS NULL;
+
+-- 14) Home page overview counters in one aggregate query
+CREATE OR REPLACE FUNCTION public.home_overview(p_user_id integer, p_today date)
+RETURNS TABLE (overdue_count integer, due_7_days integer, upcoming_count integer, completed_30_days integer)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        (count(*) FILTER (WHERE t.next_due_date < p_today))::integer,
+        (count(*) FILTER (WHERE t.next_due_date BETWEEN p_today AND p_today + 7))::integer,
+        (count(*) FILTER (WHERE t.next_due_date BETWEEN p_today AND p_today + 30))::integer,
+        (SELECT count(*) FROM public.task_history h
+          WHERE h.user_id = p_user_id AND h.action = 'completed'
+            AND h.created_at >= now() - interval '30 days')::integer
+    FROM public.tasks t
+    WHERE t.user_id = p_user_id AND t.archived = false;
+$$;
+
+-- 15) Column names of a public table (read once per app process to build safe select lists)
+CREATE OR REPLACE FUNCTION public.table_columns(p_table text)
+RETURNS SETOF text
+LANGUAGE sql STABLE
+AS $$
+    SELECT column_name::text
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = p_table;
+$$;
+
+-- 16) Questionnaire save: users persona/budget update + home_features upsert in one transaction.
+-- p_features keys are home_features column names; absent keys leave existing values untouched.
+CREATE OR REPLACE FUNCTION public.save_questionnaire(p_user_id integer, p_features jsonb, p_user_updates jsonb DEFAULT '{}'::jsonb)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    cols text;
+    sets text;
+BEGIN
+    IF p_user_updates <> '{}'::jsonb THEN
+        UPDATE public.users SET
+            persona = COALESCE(p_user_updates->>'persona', persona),
+            time_budget_minutes_per_week = COALESCE((p_user_updates->>'time_budget_minutes_per_week')::integer, time_budget_minutes_per_week),
+            onboarding_started_at = COALESCE((p_user_updates->>'onboarding_started_at')::timestamptz, onboarding_started_at)
+        WHERE id = p_user_id;
+    END IF;
+
+    SELECT string_agg(quote_ident(k), ', '), string_agg(format('%1$I = EXCLUDED.%1$I', k), ', ')
+    INTO cols, sets
+    FROM jsonb_object_keys(p_features - 'user_id') AS k;
+
+    IF cols IS NULL THEN
+        INSERT INTO public.home_features (user_id) VALUES (p_user_id) ON CONFLICT (user_id) DO NOTHING;
+    ELSE
+        EXECUTE format(
+            'INSERT INTO public.home_features (user_id, %s) '
+            'SELECT $1, %s FROM jsonb_populate_record(NULL::public.home_features, $2) '
+            'ON CONFLICT (user_id) DO UPDATE SET %s',
+            cols, cols, sets)
+        USING p_user_id, p_features;
+    END IF;
+END;
+$$;
+
+-- 17) Composite index for the per-user task reads (dashboard, calendar, task list, home overview),
+-- which all filter on user_id plus archived / is_completed and range over next_due_date
+CREATE INDEX IF NOT EXISTS idx_tasks_user_status_due
+    ON public.tasks(user_id, archived, is_completed, next_due_date);
+
+-- 18) Complete a task in one round trip: roll next_due_date forward, log history, return the row
+CREATE OR REPLACE FUNCTION public.complete_task(p_task_id integer, p_user_id integer, p_today date)
+RETURNS TABLE (title text, next_due_date date)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.tasks t
+    SET is_completed = true,
+        last_completed = p_today,
+        next_due_date = p_today + t.frequency_days
+    WHERE t.id = p_task_id AND t.user_id = p_user_id
+    RETURNING t.title::text, t.next_due_date::date;
+
+    IF FOUND THEN
+        INSERT INTO public.task_history (task_id, user_id, action, created_at)
+        VALUES (p_task_id, p_user_id, 'completed', now());
+    END IF;
+END;
+$$;
+
+-- 19) Home page data in one round trip: the user's home_features row plus the home_overview counters
+CREATE OR REPLACE FUNCTION public.home_page_data(p_user_id integer, p_today date)
+RETURNS jsonb
+LANGUAGE sql STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'features', (SELECT to_jsonb(h) FROM public.home_features h WHERE h.user_id = p_user_id LIMIT 1),
+        'overview', (SELECT to_jsonb(o) FROM public.home_overview(p_user_id, p_today) o)
+    );
+$$;
+
+-- 20) Reset a task to active and log history in one round trip; returns false if the user has no such task.
+-- The history row is best-effort (as in the app's fallback): a task_history CHECK that predates
+-- section 24 rejects 'reset', and that must not roll back the reset itself.
+CREATE OR REPLACE FUNCTION public.reset_task(p_task_id integer, p_user_id integer)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.tasks
+    SET is_completed = false, last_completed = NULL
+    WHERE id = p_task_id AND user_id = p_user_id;
+
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    BEGIN
+        INSERT INTO public.task_history (task_id, user_id, action, created_at)
+        VALUES (p_task_id, p_user_id, 'reset', now());
+    EXCEPTION WHEN check_violation THEN
+        NULL;
+    END;
+    RETURN true;
+END;
+$$;
+
+-- 21) Registration relies on a unique email (duplicate inserts fail with 23505); see fix_username_constraint.sql
+-- (cannot be added while duplicate emails exist; remove extras first. Find them with:
+--    SELECT email, count(*) FROM public.users GROUP BY email HAVING count(*) > 1;
+--  the block below skips the constraint with a warning rather than aborting the script)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'users_email_key' AND conrelid = 'public.users'::regclass
+    ) THEN
+        IF EXISTS (SELECT 1 FROM public.users GROUP BY email HAVING count(*) > 1) THEN
+            RAISE WARNING 'users_email_key not added: public.users has duplicate emails; remove them and re-run section 21';
+        ELSE
+            ALTER TABLE public.users ADD CONSTRAINT users_email_key UNIQUE (email);
+        END IF;
+    END IF;
+END$$;
+
+-- 22) task_history indexes matching its read shapes:
+-- per-task history lists (task_id, user_id, newest first) and the completed-in-last-30-days count
+CREATE INDEX IF NOT EXISTS idx_task_history_task_created ON public.task_history(task_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_task_history_user_action_created ON public.task_history(user_id, action, created_at);
+
+-- 23) task_history.created_at is stamped by the database; the app no longer sends it
+ALTER TABLE public.task_history ALTER COLUMN created_at SET DEFAULT now();
+
+-- 24) task_history.action: allow every action the app writes ('created', 'updated', 'reset'
+-- alongside 'completed' and 'snoozed'); section 2 only allowed the last two
+DO $$
+DECLARE
+    c record;
+BEGIN
+    FOR c IN
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = 'public.task_history'::regclass
+          AND contype = 'c'
+          AND pg_get_constraintdef(oid) LIKE '%action%'
+    LOOP
+        EXECUTE format('ALTER TABLE public.task_history DROP CONSTRAINT %I', c.conname);
+    END LOOP;
+    ALTER TABLE public.task_history ADD CONSTRAINT task_history_action_check
+        CHECK (action IN ('completed','snoozed','created','updated','reset'));
+END$$;